@@ -4,9 +4,17 @@ from db import database
 from routes import auth_router, superadmin_router, admin_router
 from routes.team import router as team_router
 from config import settings
+from utils.hashing import password_hasher, configure_password_hashing
+from utils.email_outbox import email_worker
+from utils.events import change_feed
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.security import HTTPBearer
 from routes.registration import router as registration_router
+from routes.diagnostics import router as diagnostics_router
+from routes.health import router as health_router
+from utils.log import log_system, RequestIdMiddleware
+from utils.metrics import MetricsMiddleware
+from routes.metrics import router as metrics_router
 
 
 app = FastAPI(docs_url=None, redoc_url=None)
@@ -44,6 +52,10 @@ app.add_middleware(
     expose_headers=["*"],
     max_age=3600,
 )
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+# Outermost, so every log line of a request (CORS preflights included) carries its id
+app.add_middleware(RequestIdMiddleware)
 
 # Include routers
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
@@ -51,12 +63,23 @@ app.include_router(superadmin_router, prefix="/superadmin", tags=["Superadmin"])
 app.include_router(admin_router, prefix="/admin", tags=["Admin"])
 app.include_router(registration_router, prefix="/registration", tags=["Registration"])
 app.include_router(team_router, prefix="/team", tags=["Team"])
+app.include_router(diagnostics_router, prefix="/diagnostics", tags=["Diagnostics"])
+app.include_router(health_router, prefix="/health", tags=["Health"])
+app.include_router(metrics_router)
 
 
 @app.on_event("startup")
 async def startup_db():
+    log_system.configure()
     await database.connect()
+    configure_password_hashing()
+    await email_worker.start()
+    await change_feed.start()
 
 @app.on_event("shutdown")
 async def shutdown_db():
-    await database.disconnect()
\ No newline at end of file
+    await change_feed.stop()
+    await email_worker.stop()
+    password_hasher.shutdown()
+    await database.disconnect()
+    log_system.shutdown()
\ No newline at end of file
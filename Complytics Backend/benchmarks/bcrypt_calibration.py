@@ -0,0 +1,40 @@
+"""bcrypt cost table and calibration result for this machine.
+
+Prints the time of one hash at each cost and the resulting login capacity
+per core, then runs the same calibration the app performs at startup.
+
+Run from the backend directory:
+
+    python benchmarks/bcrypt_calibration.py --target-ms 250
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings  # noqa: E402
+from utils.hashing import calibrate_bcrypt_rounds, measure_bcrypt_ms  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target-ms", type=float, default=settings.PASSWORD_HASH_TARGET_MS)
+    parser.add_argument("--min-rounds", type=int, default=settings.BCRYPT_MIN_ROUNDS)
+    parser.add_argument("--max-rounds", type=int, default=settings.BCRYPT_MAX_ROUNDS)
+    args = parser.parse_args()
+
+    print(f"{'rounds':>6} {'ms/hash':>10} {'logins/s/core':>14}")
+    for rounds in range(args.min_rounds, args.max_rounds + 1):
+        ms = measure_bcrypt_ms(rounds)
+        print(f"{rounds:>6} {ms:>10.1f} {1000 / ms:>14.1f}")
+        if ms > args.target_ms * 4:
+            break
+
+    rounds, ms = calibrate_bcrypt_rounds(args.target_ms, args.min_rounds, args.max_rounds)
+    print(f"\ncalibrated for {args.target_ms:.0f} ms: rounds={rounds} ({ms:.1f} ms/hash, "
+          f"{1000 / ms:.1f} logins/s/core)")
+
+
+if __name__ == "__main__":
+    main()
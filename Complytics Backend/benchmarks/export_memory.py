@@ -0,0 +1,103 @@
+"""Peak RSS of exporting N users: streaming export vs. the materialized list path.
+
+Each mode runs in its own subprocess so peak RSS is measured independently.
+Documents come from a synthetic async cursor that yields them in batches,
+the way Motor hands back getMore results, so no database is required.
+
+    stream       utils.export.stream_export -> NDJSON chunks, discarded
+    materialize  to_list() -> UserInDB models -> one JSON body (old /active-users)
+
+Run from the backend directory:
+
+    python benchmarks/export_memory.py --users 1000000
+"""
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class SyntheticCursor:
+    def __init__(self, count: int, batch_size: int = 1000):
+        self.count = count
+        self.batch_size = batch_size
+
+    def _batch(self, start: int, end: int):
+        now = datetime.utcnow()
+        return [
+            {
+                "_id": ObjectId(),
+                "email": f"user{i}@example{i % 1000}.com",
+                "first_name": f"First{i}",
+                "last_name": f"Last{i}",
+                "role": "it_team",
+                "organization_id": "65f1c0ffee0000000000beef",
+                "is_active": True,
+                "created_at": now,
+                "updated_at": now,
+                "created_by": "65f1c0ffee0000000000cafe",
+            }
+            for i in range(start, end)
+        ]
+
+    async def __aiter__(self):
+        for start in range(0, self.count, self.batch_size):
+            for doc in self._batch(start, min(start + self.batch_size, self.count)):
+                yield doc
+            await asyncio.sleep(0)
+
+    async def to_list(self, length=None):
+        return [doc async for doc in self]
+
+
+async def run_stream(count: int) -> int:
+    from utils.export import USER_EXPORT_FIELDS, stream_export
+    total = 0
+    async for chunk in stream_export(SyntheticCursor(count), USER_EXPORT_FIELDS, "ndjson"):
+        total += len(chunk)
+    return total
+
+
+async def run_materialize(count: int) -> int:
+    from typing import List
+    from pydantic import TypeAdapter
+    from schemas.users import UserInDB
+    docs = await SyntheticCursor(count).to_list(None)
+    models = [UserInDB.from_mongo(doc) for doc in docs]
+    return len(TypeAdapter(List[UserInDB]).dump_json(models, by_alias=False))
+
+
+def child(mode: str, count: int):
+    started = time.perf_counter()
+    runner = run_stream if mode == "stream" else run_materialize
+    size = asyncio.run(runner(count))
+    elapsed = time.perf_counter() - started
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:<12} {count:>10,} {size / 1e6:>10.1f} {elapsed:>8.1f} {peak_mb:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--mode", choices=["stream", "materialize"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        child(args.mode, args.users)
+        return
+
+    print(f"{'mode':<12} {'users':>10} {'out MB':>10} {'sec':>8} {'peak RSS MB':>10}")
+    for mode in ("stream", "materialize"):
+        subprocess.run([sys.executable, __file__, "--mode", mode, "--users", str(args.users)], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Throughput of JWT verification with and without the verified-token cache.
+
+Simulates a pool of active sessions each presenting its bearer token many
+times, and reports decoded tokens per second for plain ``jwt.decode`` and
+for ``decode_access_token``.
+
+Run from the backend directory:
+
+    python benchmarks/jwt_decode.py --sessions 500 --requests 50000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jose import jwt  # noqa: E402
+from config import settings  # noqa: E402
+from utils.security import (  # noqa: E402
+    create_access_token,
+    decode_access_token,
+    verified_token_cache,
+)
+
+
+def measure(decode, tokens):
+    started = time.perf_counter()
+    for token in tokens:
+        decode(token)
+    return len(tokens) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=500, help="distinct bearer tokens")
+    parser.add_argument("--requests", type=int, default=50000, help="decodes per run")
+    args = parser.parse_args()
+
+    sessions = [
+        create_access_token(
+            {"sub": f"user{i}@example.com", "uid": str(i), "role": "admin", "ver": 0, "cv": 1},
+            expires_delta=timedelta(minutes=30)
+        )
+        for i in range(args.sessions)
+    ]
+    rng = random.Random(42)
+    stream = [rng.choice(sessions) for _ in range(args.requests)]
+
+    uncached = measure(
+        lambda token: jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]),
+        stream
+    )
+    verified_token_cache.clear()
+    cached = measure(decode_access_token, stream)
+
+    print(f"{'mode':<10} {'tokens/s':>12}")
+    print(f"{'uncached':<10} {uncached:>12,.0f}")
+    print(f"{'cached':<10} {cached:>12,.0f}")
+    print(f"speedup: {cached / uncached:.1f}x  cache: {verified_token_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
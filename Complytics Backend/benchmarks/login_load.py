@@ -0,0 +1,83 @@
+"""Event-loop stall benchmark for password hashing.
+
+Fires a burst of concurrent logins next to a steady stream of cheap requests
+(a stand-in for /auth/me) and reports the latency of the cheap requests with
+bcrypt run inline on the event loop versus through the hashing worker pool.
+
+Run from the backend directory:
+
+    python benchmarks/login_load.py --logins 40 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.hashing import PasswordHasher, pwd_context  # noqa: E402
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def probe(latencies, stop, interval):
+    # Requests arrive on a fixed schedule; latency is measured from the
+    # scheduled arrival, so time spent waiting on a blocked loop is counted
+    arrival = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+        await asyncio.sleep(0)
+        latencies.append((time.perf_counter() - arrival) * 1000)
+        arrival += interval
+
+
+async def run(mode, args, hashed):
+    hasher = PasswordHasher("thread", args.workers, args.logins, timeout=60)
+
+    async def login():
+        if mode == "inline":
+            pwd_context.verify("correct horse", hashed)
+        else:
+            await hasher.verify("correct horse", hashed)
+
+    latencies = []
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe(latencies, stop, args.interval / 1000))
+    await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(args.logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await prober
+    hasher.shutdown()
+    return elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=40, help="concurrent login attempts")
+    parser.add_argument("--workers", type=int, default=4, help="hashing pool size")
+    parser.add_argument("--interval", type=float, default=5.0, help="probe interval in ms")
+    args = parser.parse_args()
+
+    hashed = pwd_context.hash("correct horse")
+    print(f"{'mode':<8} {'logins/s':>9} {'probes':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for mode in ("inline", "pool"):
+        elapsed, latencies = asyncio.run(run(mode, args, hashed))
+        print(
+            f"{mode:<8} {args.logins / elapsed:>9.1f} {len(latencies):>7} "
+            f"{statistics.median(latencies):>8.2f} {percentile(latencies, 99):>8.2f} "
+            f"{max(latencies):>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
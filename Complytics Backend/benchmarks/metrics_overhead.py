@@ -0,0 +1,113 @@
+"""Per-request cost of MetricsMiddleware and per-command cost of the Mongo listener.
+
+Requests go straight into a throwaway FastAPI app through the ASGI
+interface, with and without ``MetricsMiddleware``; the difference is the
+middleware's cost. The listener is fed synthetic started/succeeded events
+inside a request context, with byte accounting on and off.
+
+Run from the backend directory:
+
+    python benchmarks/metrics_overhead.py --requests 20000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from bson import ObjectId
+from fastapi import FastAPI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings  # noqa: E402
+from utils.metrics import MetricsMiddleware, RequestStats, command_metrics, request_stats_var  # noqa: E402
+
+
+def build_app(with_metrics: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/members/{member_id}")
+    async def member(member_id: str):
+        return {"id": member_id}
+
+    if with_metrics:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def call(app, path: str):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": b"", "headers": [], "client": ("127.0.0.1", 0), "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def seconds_per_request(app, count: int) -> float:
+    for i in range(200):
+        await call(app, f"/members/{i}")
+    started = time.perf_counter()
+    for i in range(count):
+        await call(app, f"/members/{i}")
+    return (time.perf_counter() - started) / count
+
+
+class FindEvent:
+    command_name = "find"
+    duration_micros = 800
+
+    def __init__(self, rows: int):
+        self.command = {"find": "users", "filter": {"organization_id": str(ObjectId())}, "limit": rows}
+        self.reply = {"ok": 1, "cursor": {"id": 0, "ns": "complytics.users", "firstBatch": [
+            {"_id": ObjectId(), "email": f"user{i}@example.com", "first_name": "First", "last_name": "Last"}
+            for i in range(rows)
+        ]}}
+
+
+def listener_cost(count: int, rows: int, with_bytes: bool) -> float:
+    settings.METRICS_MONGO_BYTES = with_bytes
+    event = FindEvent(rows)
+    token = request_stats_var.set(RequestStats())
+    try:
+        started = time.perf_counter()
+        for _ in range(count):
+            command_metrics.started(event)
+            command_metrics.succeeded(event)
+        return (time.perf_counter() - started) / count
+    finally:
+        request_stats_var.reset(token)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    plain, metered = build_app(False), build_app(True)
+    baseline = statistics.median(asyncio.run(seconds_per_request(plain, args.requests)) for _ in range(args.rounds))
+    measured = statistics.median(asyncio.run(seconds_per_request(metered, args.requests)) for _ in range(args.rounds))
+    print(f"{args.requests} requests x {args.rounds} rounds (median)")
+    print(f"  without middleware  {baseline * 1e6:8.1f} us/request")
+    print(f"  with middleware     {measured * 1e6:8.1f} us/request")
+    print(f"  overhead            {(measured - baseline) * 1e6:8.1f} us/request")
+
+    print("command listener, started + succeeded per command:")
+    for rows in (1, 50):
+        for with_bytes in (False, True):
+            cost = listener_cost(20000, rows, with_bytes)
+            print(f"  {rows:>3}-row reply, bytes {'on ' if with_bytes else 'off'}  {cost * 1e6:8.2f} us/command")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Bytes on the wire and BSON decode time with and without projections.
+
+Builds a synthetic users collection shaped like the documents the routes
+write (admins created from registrations carry the registration fields as
+well), applies each projection the way the server would, and compares the
+encoded size and client-side decode time of the full documents.
+
+Run from the backend directory:
+
+    python benchmarks/projection_bytes.py --users 50000
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+from datetime import datetime
+
+import bson
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import projections  # noqa: E402
+
+
+def synthetic_user(rng: random.Random, i: int) -> dict:
+    doc = {
+        "_id": ObjectId(),
+        "first_name": f"First{i}",
+        "last_name": f"Last{i}",
+        "email": f"user{i}@example{i % 500}.com",
+        "password_hash": "$2b$12$" + "".join(rng.choices(string.ascii_letters + string.digits, k=53)),
+        "role": rng.choice(["admin", "compliance_team", "it_team", "management_team"]),
+        "organization_id": str(ObjectId()),
+        "created_by": str(ObjectId()),
+        "is_active": True,
+        "token_version": 0,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+    }
+    if doc["role"] == "admin":
+        doc.update({
+            "password": "".join(rng.choices(string.ascii_letters, k=12)),
+            "organization_name": f"Organization {i % 500}",
+            "organization_domain": f"example{i % 500}.com",
+        })
+    return doc
+
+
+def project(doc: dict, projection: dict) -> dict:
+    return {key: value for key, value in doc.items() if key == "_id" or projection.get(key)}
+
+
+def measure(docs, label):
+    payloads = [bson.encode(doc) for doc in docs]
+    size = sum(len(payload) for payload in payloads)
+    started = time.perf_counter()
+    for payload in payloads:
+        bson.decode(payload)
+    return label, size, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    users = [synthetic_user(rng, i) for i in range(args.users)]
+
+    rows = [
+        measure(users, "full document"),
+        measure([project(u, projections.USER_LISTING_ROW) for u in users], "USER_LISTING_ROW"),
+        measure([project(u, projections.USER_CONTACT) for u in users], "USER_CONTACT"),
+        measure([project(u, projections.ID_ONLY) for u in users], "ID_ONLY"),
+    ]
+
+    full_size, full_decode = rows[0][1], rows[0][2]
+    print(f"{'projection':<18} {'MB':>8} {'saved':>7} {'decode ms':>10} {'saved':>7}")
+    for label, size, decode in rows:
+        print(
+            f"{label:<18} {size / 1e6:>8.2f} {1 - size / full_size:>7.1%} "
+            f"{decode * 1000:>10.1f} {1 - decode / full_decode:>7.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
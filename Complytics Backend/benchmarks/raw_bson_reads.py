@@ -0,0 +1,119 @@
+"""CPU time and peak memory of listings and exports: dict vs. raw BSON reads.
+
+Synthetic users (USER_LISTING_ROW fields) are pre-encoded into BSON batches,
+the bytes a getMore reply carries, and a cursor decodes each batch on demand
+with the chosen document class, as pymongo does:
+
+    dict  batches decoded to dicts (the default codec)
+    raw   batches kept as RawBSONDocuments, rows inflated one at a time
+
+Each mode feeds the same code the routes run: the legacy listing
+(to_list -> from_mongo_trusted -> orjson body) and the NDJSON export
+(utils.export.stream_export). CPU time comes from an untraced pass; peak
+memory is the tracemalloc high-water mark of a second pass.
+
+Run from the backend directory:
+
+    python benchmarks/raw_bson_reads.py --users 100000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import bson
+from bson import ObjectId
+from bson.codec_options import DEFAULT_CODEC_OPTIONS
+from bson.raw_bson import RawBSONDocument
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schemas.users import UserInDB  # noqa: E402
+from utils.export import USER_EXPORT_FIELDS, stream_export  # noqa: E402
+from utils.raw_bson import inflate  # noqa: E402
+from utils.responses import render_json  # noqa: E402
+
+CODECS = {
+    "dict": DEFAULT_CODEC_OPTIONS,
+    "raw": DEFAULT_CODEC_OPTIONS.with_options(document_class=RawBSONDocument),
+}
+
+
+def encoded_batches(count: int, batch_size: int) -> list:
+    now = datetime.utcnow()
+    batches = []
+    for start in range(0, count, batch_size):
+        batches.append(b"".join(
+            bson.encode({
+                "_id": ObjectId(),
+                "email": f"user{i}@example{i % 500}.com",
+                "first_name": f"First{i}",
+                "last_name": f"Last{i}",
+                "role": "it_team",
+                "organization_id": str(ObjectId()),
+                "created_by": str(ObjectId()),
+                "is_active": True,
+                "created_at": now,
+                "updated_at": now,
+            })
+            for i in range(start, min(start + batch_size, count))
+        ))
+    return batches
+
+
+class BatchCursor:
+    """Async cursor over pre-encoded batches, decoded one batch at a time"""
+
+    def __init__(self, batches: list, codec_options):
+        self.batches = batches
+        self.codec_options = codec_options
+
+    async def __aiter__(self):
+        for batch in self.batches:
+            for doc in bson.decode_all(batch, self.codec_options):
+                yield doc
+
+    async def to_list(self, length=None):
+        return [doc async for doc in self]
+
+
+async def listing(cursor) -> int:
+    docs = await cursor.to_list(None)
+    return len(render_json([UserInDB.from_mongo_trusted(inflate(doc)) for doc in docs]))
+
+async def export(cursor) -> int:
+    return sum([len(chunk) async for chunk in stream_export(cursor, USER_EXPORT_FIELDS, "ndjson")])
+
+
+def measure(workload, batches: list, codec_options):
+    started = time.process_time()
+    size = asyncio.run(workload(BatchCursor(batches, codec_options)))
+    cpu = time.process_time() - started
+
+    tracemalloc.start()
+    asyncio.run(workload(BatchCursor(batches, codec_options)))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    batches = encoded_batches(args.users, args.batch_size)
+    print(f"{args.users} users, {sum(map(len, batches)) / 2**20:.1f} MB of BSON in batches of {args.batch_size}")
+    print(f"{'workload':<10} {'codec':<6} {'cpu s':>7} {'peak MB':>8} {'body MB':>8}")
+    for name, workload in (("listing", listing), ("export", export)):
+        for codec, options in CODECS.items():
+            cpu, peak, size = measure(workload, batches, options)
+            print(f"{name:<10} {codec:<6} {cpu:>7.2f} {peak / 2**20:>8.1f} {size / 2**20:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Fan-out latency of the SSE event broker with many connected clients.
+
+Serves utils.events.event_stream_response over uvicorn, connects N raw
+HTTP clients to it, publishes events through the broker and measures how
+long each event takes to reach each client. Clients and server share one
+event loop, so the numbers include the clients' own parsing work.
+
+Run from the backend directory:
+
+    python benchmarks/sse_fanout.py --clients 1000 --events 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from utils.events import event_broker, event_stream_response  # noqa: E402
+
+TOPIC = "benchmark"
+
+app = FastAPI()
+
+@app.get("/events")
+async def events():
+    return event_stream_response(TOPIC)
+
+
+async def client(port: int, expected: int, latencies: list):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /events HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    await writer.drain()
+    received = 0
+    while received < expected:
+        line = await reader.readline()
+        if not line:
+            break
+        if line.startswith(b"data: "):
+            event = json.loads(line[6:])
+            latencies.append(time.perf_counter() - event["document"]["sent_at"])
+            received += 1
+    writer.close()
+
+
+async def run(clients: int, events: int, interval: float, port: int):
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning", backlog=clients * 2))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    latencies = []
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(client(port, events, latencies)) for _ in range(clients)]
+    while event_broker.metrics()["subscribers"] < clients:
+        await asyncio.sleep(0.05)
+    connect_seconds = time.perf_counter() - started
+
+    publish_ms = []
+    for i in range(events):
+        sent_at = time.perf_counter()
+        event_broker.publish(TOPIC, {"type": "insert", "id": str(i), "document": {"sent_at": sent_at}})
+        publish_ms.append((time.perf_counter() - sent_at) * 1000)
+        await asyncio.sleep(interval)
+
+    await asyncio.wait_for(asyncio.gather(*tasks), timeout=60)
+    server.should_exit = True
+    await serving
+    return connect_seconds, publish_ms, sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--interval-ms", type=float, default=100.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    connect_seconds, publish_ms, latencies = asyncio.run(
+        run(args.clients, args.events, args.interval_ms / 1000, args.port)
+    )
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    print(f"{args.clients} clients connected in {connect_seconds:.2f} s")
+    print(f"deliveries: {len(latencies)} of {args.clients * args.events}")
+    print(f"publish() per event: {statistics.median(publish_ms):.2f} ms median")
+    print(f"delivery latency ms: p50 {pct(0.5):.1f}  p95 {pct(0.95):.1f}  p99 {pct(0.99):.1f}  max {latencies[-1] * 1000:.1f}")
+    print(f"broker: {event_broker.metrics()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""End-to-end latency of the account-creating endpoints at a given Mongo RTT.
+
+Calls the route handlers directly against an in-memory database whose every
+operation costs one simulated round trip (``--rtt-ms``) and which enforces
+the same unique email indexes as utils/indexes.py. bcrypt runs in the real
+worker pool at ``--rounds``, so handlers that overlap hashing with I/O show
+it. Run the same script against two checkouts to compare them.
+
+Run from the backend directory:
+
+    python benchmarks/write_path_latency.py --rtt-ms 5 --rounds 10
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import database  # noqa: E402
+from schemas.users import TokenClaims, UserCreate  # noqa: E402
+from utils.hashing import apply_bcrypt_rounds, password_hasher  # noqa: E402
+from routes.admin import TeamMemberCreate, create_team_member  # noqa: E402
+from routes.registration import approve_registration, register_organization_admin  # noqa: E402
+from routes.superadmin import create_admin_account  # noqa: E402
+
+
+def _lookup(doc: dict, path: str):
+    for part in path.split("."):
+        doc = doc.get(part) if isinstance(doc, dict) else None
+    return doc
+
+
+class DeleteResult:
+    def __init__(self, deleted_count: int):
+        self.deleted_count = deleted_count
+
+
+class LatencyCollection:
+    """Just enough of a Motor collection for the write paths, one RTT per call"""
+
+    def __init__(self, rtt: float, unique: str = None):
+        self.rtt = rtt
+        self.unique = unique
+        self.docs = {}
+
+    def _match(self, query: dict):
+        for doc in self.docs.values():
+            if all(_lookup(doc, key) == value for key, value in query.items()):
+                return doc
+        return None
+
+    async def find_one(self, query, projection=None):
+        await asyncio.sleep(self.rtt)
+        return self._match(query)
+
+    async def insert_one(self, doc):
+        await asyncio.sleep(self.rtt)
+        if self.unique and self._match({self.unique: _lookup(doc, self.unique)}):
+            raise DuplicateKeyError("E11000 duplicate key error", 11000)
+        doc.setdefault("_id", ObjectId())
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def find_one_and_delete(self, query):
+        await asyncio.sleep(self.rtt)
+        doc = self._match(query)
+        if doc:
+            del self.docs[doc["_id"]]
+        return doc
+
+    async def delete_one(self, query):
+        await asyncio.sleep(self.rtt)
+        doc = self._match(query)
+        if doc:
+            del self.docs[doc["_id"]]
+        return DeleteResult(1 if doc else 0)
+
+    # Counter upserts (org_stats, change_versions) only cost their round trip here
+    async def update_one(self, query, update, upsert=False):
+        await asyncio.sleep(self.rtt)
+
+    async def bulk_write(self, requests, ordered=True):
+        await asyncio.sleep(self.rtt)
+
+
+class LatencyDatabase:
+    def __init__(self, rtt: float):
+        self.users = LatencyCollection(rtt, unique="email")
+        self.pending_registrations = LatencyCollection(rtt, unique="user_data.email")
+        self.organizations = LatencyCollection(rtt)
+        self.email_outbox = LatencyCollection(rtt)
+        self.org_stats = LatencyCollection(rtt)
+        self.change_versions = LatencyCollection(rtt)
+
+
+async def timed(samples: list, coro):
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = await coro
+    samples.append((time.perf_counter() - started) * 1000)
+    return result
+
+
+async def run(iterations: int):
+    superadmin = TokenClaims(id=str(ObjectId()), email="superadmin@complytics.com", role="superadmin")
+    timings = {name: [] for name in ("register", "approve", "create-team-member", "create-admin")}
+
+    for i in range(iterations):
+        registration = await timed(timings["register"], register_organization_admin(UserCreate(
+            email=f"owner{i}@org{i}.com", first_name="Org", last_name="Owner",
+            password="registrant-pass", organization_name=f"Org {i}", organization_domain=f"org{i}.com"
+        )))
+        admin = await timed(timings["approve"], approve_registration(registration["registration_id"], superadmin))
+        admin_claims = TokenClaims(
+            id=admin.id, email=admin.email, role="admin", organization_id=admin.organization_id
+        )
+        await timed(timings["create-team-member"], create_team_member(TeamMemberCreate(
+            first_name="Team", last_name="Member", email=f"member{i}@org{i}.com", role="it_team"
+        ), admin_claims))
+        await timed(timings["create-admin"], create_admin_account(UserCreate(
+            email=f"admin{i}@example.com", first_name="Extra", last_name="Admin", password="admin-password"
+        ), superadmin))
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rtt-ms", type=float, default=5.0)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    database.db = LatencyDatabase(args.rtt_ms / 1000)
+    apply_bcrypt_rounds(args.rounds)
+    password_hasher.start()
+    try:
+        timings = asyncio.run(run(args.iterations))
+    finally:
+        password_hasher.shutdown()
+
+    print(f"rtt={args.rtt_ms} ms, bcrypt rounds={args.rounds}, {args.iterations} iterations")
+    print(f"{'endpoint':<20} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, samples in timings.items():
+        samples.sort()
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        print(f"{name:<20} {statistics.median(samples):>8.1f} {p95:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 import os
+from typing import Optional
 
 # Load environment variables first
 load_dotenv()
@@ -11,6 +12,35 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+
+    # Motor connection pool; timeouts in milliseconds, None keeps the driver default
+    MONGODB_MAX_POOL_SIZE: int = 100
+    MONGODB_MIN_POOL_SIZE: int = 10
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = 5000
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGODB_CONNECT_TIMEOUT_MS: int = 5000
+    MONGODB_SOCKET_TIMEOUT_MS: Optional[int] = None
+    MONGODB_WARMUP_CONNECTIONS: int = 10
+
+    # List endpoints: keyset pagination; bare unpaginated lists stay the default
+    # for clients that send neither limit nor cursor while this is enabled
+    LEGACY_UNPAGINATED_LISTS: bool = True
+    PAGINATION_DEFAULT_LIMIT: int = 50
+    PAGINATION_MAX_LIMIT: int = 200
+
+    # Documents per getMore when streaming /superadmin/export/...
+    EXPORT_BATCH_SIZE: int = 1000
+
+    # Listing and export reads keep batches as raw BSON and decode row by row
+    MONGODB_RAW_BSON_READS: bool = True
+
+    # /admin/team-members/bulk-delete: ids per request, and deletes in flight at once
+    BULK_DELETE_MAX_IDS: int = 500
+    BULK_DELETE_CONCURRENCY: int = 8
+
+    # Index reconciliation against utils/indexes.py at startup
+    MONGODB_RECONCILE_INDEXES: bool = True
+    MONGODB_REBUILD_DRIFTED_INDEXES: bool = False
     
     # SMTP settings
     SMTP_HOST: str
@@ -18,7 +48,72 @@ class Settings(BaseSettings):
     SMTP_USERNAME: str
     SMTP_PASSWORD: str
     SMTP_FROM_EMAIL: str
-    
+    # Plain SMTP (e.g. a local aiosmtpd stand-in) when False; empty username skips login
+    SMTP_USE_SSL: bool = True
+    SMTP_CONNECTION_MAX_IDLE_SECONDS: float = 60.0
+
+    # Email outbox delivery worker
+    EMAIL_OUTBOX_POLL_SECONDS: float = 5.0
+    EMAIL_SEND_LEASE_SECONDS: int = 120
+    EMAIL_MAX_ATTEMPTS: int = 5
+    EMAIL_RETRY_BASE_SECONDS: int = 30
+    EMAIL_RETRY_MAX_SECONDS: int = 3600
+
+    # Password hashing worker pool ("thread" or "process")
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    PASSWORD_HASH_TIMEOUT_SECONDS: float = 5.0
+
+    # bcrypt cost; left unset it is calibrated at startup to hit the target latency
+    BCRYPT_ROUNDS: Optional[int] = None
+    BCRYPT_MIN_ROUNDS: int = 10
+    BCRYPT_MAX_ROUNDS: int = 15
+    PASSWORD_HASH_TARGET_MS: float = 250.0
+
+    # Login / forgot-password throttling ("memory" or "mongo" for multi-worker)
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    LOGIN_RATE_LIMIT_PER_IP: int = 20
+    LOGIN_RATE_LIMIT_PER_EMAIL: int = 5
+    LOGIN_RATE_LIMIT_WINDOW_SECONDS: int = 60
+    FORGOT_PASSWORD_RATE_LIMIT_PER_IP: int = 5
+    FORGOT_PASSWORD_RATE_LIMIT_PER_EMAIL: int = 3
+    FORGOT_PASSWORD_RATE_LIMIT_WINDOW_SECONDS: int = 900
+
+    # Authenticated principal cache used by get_current_user
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0
+
+    # Per-user token version cache used by get_current_claims
+    TOKEN_VERSION_CACHE_SIZE: int = 50000
+    TOKEN_VERSION_CACHE_TTL_SECONDS: float = 30.0
+
+    # Verified JWT cache; tokens without exp fall back to the TTL
+    TOKEN_CACHE_SIZE: int = 10000
+    TOKEN_CACHE_TTL_SECONDS: float = 300.0
+
+    # Pre-serialized list responses, validated by the ETag scope versions
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_MAX_ENTRY_BYTES: int = 4 * 1024 * 1024
+
+    # Logging (utils/log.py): "json" or "text"; DEBUG lines are kept for this
+    # fraction of requests
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    LOG_DEBUG_SAMPLE_RATE: float = 1.0
+    LOG_QUEUE_SIZE: int = 10000
+
+    # Prometheus metrics (utils/metrics.py); set METRICS_TOKEN to require it as a bearer token on /metrics
+    METRICS_ENABLED: bool = True
+    METRICS_MONGO_BYTES: bool = True
+    METRICS_TOKEN: Optional[str] = None
+
+    # Live events (SSE); change streams need a replica set, otherwise writes publish in-process
+    CHANGE_STREAMS_ENABLED: bool = True
+    SSE_HEARTBEAT_SECONDS: float = 15.0
+    SSE_QUEUE_SIZE: int = 256
+
     class Config:
         env_file = ".env"
         extra = "ignore"
@@ -1,17 +1,59 @@
+import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 from config import settings
+from utils.indexes import reconcile_indexes
+from utils.pool_metrics import pool_metrics
+from utils.metrics import command_metrics
+from utils.log import get_logger
+
+logger = get_logger("db")
 
 class Database:
     client: AsyncIOMotorClient = None
     db = None
 
     async def connect(self):
-        self.client = AsyncIOMotorClient(settings.MONGODB_URL)
+        self.client = AsyncIOMotorClient(
+            settings.MONGODB_URL,
+            maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+            minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+            waitQueueTimeoutMS=settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+            serverSelectionTimeoutMS=settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=settings.MONGODB_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=settings.MONGODB_SOCKET_TIMEOUT_MS,
+            event_listeners=[pool_metrics, command_metrics] if settings.METRICS_ENABLED else [pool_metrics]
+        )
         self.db = self.client[settings.MONGODB_NAME]
-        print("Connected to MongoDB")
+        await self.warmup()
+        logger.info("Connected to MongoDB")
+
+        if settings.MONGODB_RECONCILE_INDEXES:
+            report = await reconcile_indexes(self.db, rebuild_drifted=settings.MONGODB_REBUILD_DRIFTED_INDEXES)
+            logger.info(
+                "Indexes: %d created, %d unchanged, %d rebuilt",
+                len(report["created"]), len(report["unchanged"]), len(report["rebuilt"])
+            )
+            for label in report["drifted"]:
+                logger.warning("Index drift %s", label)
+            for label in report["extraneous"]:
+                logger.warning("Index not in spec: %s", label)
+            for label in report["errors"]:
+                logger.error("Index %s", label)
+
+    async def warmup(self):
+        """Open connections up front so the first requests don't pay for them"""
+        connections = max(1, settings.MONGODB_WARMUP_CONNECTIONS)
+        await asyncio.gather(*(self.client.admin.command("ping") for _ in range(connections)))
+
+    async def ping(self) -> bool:
+        try:
+            await self.client.admin.command("ping")
+            return True
+        except Exception:
+            return False
 
     async def disconnect(self):
         self.client.close()
-        print("Disconnected from MongoDB")
+        logger.info("Disconnected from MongoDB")
 
 database = Database()
\ No newline at end of file
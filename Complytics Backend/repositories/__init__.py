@@ -0,0 +1 @@
+# This file makes the repositories directory a Python package
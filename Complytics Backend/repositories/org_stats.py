@@ -0,0 +1,110 @@
+"""Per-organization membership counters, kept current with ``$inc``.
+
+One ``org_stats`` document per organization (``_id`` is the organization id
+as stored on users)::
+
+    {"total": 12, "active": 11,
+     "roles": {"admin": {"total": 1, "active": 1}, "it_team": {...}},
+     "updated_at": ...}
+
+The counter write follows the user write rather than sharing a transaction
+with it, so a crash in between can leave a counter off by one;
+``reconcile_org_stats`` rebuilds everything from the users collection.
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, List, Optional
+from pymongo import ReplaceOne
+from db import database
+
+
+def _member_delta(member: dict, sign: int) -> Counter:
+    role = member.get("role")
+    active = sign if member.get("is_active", True) else 0
+    return Counter({
+        "total": sign,
+        "active": active,
+        f"roles.{role}.total": sign,
+        f"roles.{role}.active": active,
+    })
+
+async def _apply(organization_id: Optional[str], delta: Counter):
+    delta = {key: value for key, value in delta.items() if value}
+    if not organization_id or not delta:
+        return
+    await database.db.org_stats.update_one(
+        {"_id": organization_id},
+        {"$inc": delta, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+
+async def record_member_added(organization_id: Optional[str], member: dict):
+    await _apply(organization_id, _member_delta(member, 1))
+
+async def record_members_removed(organization_id: Optional[str], members: Iterable[dict]):
+    delta = Counter()
+    for member in members:
+        delta.update(_member_delta(member, -1))
+    await _apply(organization_id, delta)
+
+async def record_member_changed(organization_id: Optional[str], before: dict, after: dict):
+    """Move a member between role/active buckets; no-op if neither changed"""
+    await record_members_changed(organization_id, [(before, after)])
+
+async def record_members_changed(organization_id: Optional[str], pairs: Iterable[tuple]):
+    """Apply several ``(before, after)`` moves as one $inc"""
+    delta = Counter()
+    for before, after in pairs:
+        delta.update(_member_delta(after, 1))
+        delta.update(_member_delta(before, -1))
+    await _apply(organization_id, delta)
+
+
+async def find_stats(organization_id: str) -> Optional[dict]:
+    return await database.db.org_stats.find_one({"_id": organization_id})
+
+async def platform_totals() -> List[dict]:
+    """Sum the per-organization counters (one document per organization, not per user)"""
+    return await database.db.org_stats.aggregate([
+        {"$group": {
+            "_id": None,
+            "organizations": {"$sum": 1},
+            "total": {"$sum": "$total"},
+            "active": {"$sum": "$active"},
+        }}
+    ]).to_list(1)
+
+
+async def reconcile_org_stats(db=None) -> dict:
+    """Rebuild every counter from the users collection.
+
+    Writes that land while this runs can be overwritten, so schedule it
+    when traffic is low; running it again is always safe.
+    """
+    db = db if db is not None else database.db
+    rows = await db.users.aggregate([
+        {"$match": {"organization_id": {"$nin": [None, ""]}}},
+        {"$group": {
+            "_id": {"organization_id": "$organization_id", "role": "$role"},
+            "total": {"$sum": 1},
+            "active": {"$sum": {"$cond": [{"$eq": ["$is_active", False]}, 0, 1]}},
+        }}
+    ]).to_list(None)
+
+    now = datetime.utcnow()
+    stats = {}
+    for row in rows:
+        org_id = row["_id"]["organization_id"]
+        doc = stats.setdefault(org_id, {"_id": org_id, "total": 0, "active": 0, "roles": {}, "updated_at": now})
+        doc["total"] += row["total"]
+        doc["active"] += row["active"]
+        doc["roles"][row["_id"]["role"]] = {"total": row["total"], "active": row["active"]}
+
+    if stats:
+        await db.org_stats.bulk_write(
+            [ReplaceOne({"_id": org_id}, doc, upsert=True) for org_id, doc in stats.items()],
+            ordered=False
+        )
+    removed = await db.org_stats.delete_many({"_id": {"$nin": list(stats)}})
+    return {"organizations": len(stats), "removed": removed.deleted_count}
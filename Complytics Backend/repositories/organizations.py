@@ -0,0 +1,18 @@
+from typing import Optional
+from bson import ObjectId
+from db import database
+from utils.etags import bump_versions, ORGANIZATIONS_SCOPE
+
+
+async def insert_organization(org_dict: dict) -> dict:
+    """Insert an organization and return it as stored (``_id`` filled in by the driver)"""
+    await database.db.organizations.insert_one(org_dict)
+    await bump_versions(ORGANIZATIONS_SCOPE)
+    return org_dict
+
+async def find_by_id(organization_id: ObjectId, projection: dict) -> Optional[dict]:
+    return await database.db.organizations.find_one({"_id": organization_id}, projection)
+
+async def delete_organization(organization_id: ObjectId):
+    await database.db.organizations.delete_one({"_id": organization_id})
+    await bump_versions(ORGANIZATIONS_SCOPE)
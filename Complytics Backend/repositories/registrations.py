@@ -0,0 +1,24 @@
+from typing import Optional
+from bson import ObjectId
+from db import database
+from utils.events import local_change
+from utils.etags import bump_versions, PENDING_REGISTRATIONS_SCOPE
+
+
+async def insert_pending(registration: dict) -> dict:
+    """Insert a pending registration and return it as stored"""
+    await database.db.pending_registrations.insert_one(registration)
+    local_change("pending_registrations", "insert", registration)
+    await bump_versions(PENDING_REGISTRATIONS_SCOPE)
+    return registration
+
+async def find_by_email(email: str, projection: dict) -> Optional[dict]:
+    return await database.db.pending_registrations.find_one({"user_data.email": email}, projection)
+
+async def pop_pending(registration_id: ObjectId) -> Optional[dict]:
+    """Atomically remove and return a pending registration"""
+    registration = await database.db.pending_registrations.find_one_and_delete({"_id": registration_id})
+    if registration:
+        local_change("pending_registrations", "delete", registration)
+        await bump_versions(PENDING_REGISTRATIONS_SCOPE)
+    return registration
@@ -0,0 +1,136 @@
+import asyncio
+from typing import List, Optional, Tuple
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from config import settings
+from db import database
+from utils import projections
+from utils.events import local_change
+from utils.etags import bump_versions, user_scopes
+
+TEAM_ROLES = ["compliance_team", "it_team", "management_team"]
+
+
+def _team_member_filter(organization_id: str, member_id=None) -> dict:
+    query = {"organization_id": organization_id, "role": {"$in": TEAM_ROLES}}
+    if isinstance(member_id, list):
+        query["_id"] = {"$in": member_id}
+    elif member_id is not None:
+        query["_id"] = member_id
+    return query
+
+async def insert_user(user_dict: dict) -> dict:
+    """Insert a user and return it as stored, without reading it back.
+
+    insert_one fills in ``_id`` on the dict we sent, so that dict already is
+    the stored document; only the password hash is stripped.
+    """
+    await database.db.users.insert_one(user_dict)
+    local_change("users", "insert", user_dict)
+    await bump_versions(*user_scopes(user_dict.get("organization_id")))
+    return {key: value for key, value in user_dict.items() if key != "password_hash"}
+
+async def find_by_email(email: str, projection: dict) -> Optional[dict]:
+    return await database.db.users.find_one({"email": email}, projection)
+
+async def set_password_hash(email: str, password_hash: str):
+    await database.db.users.update_one(
+        {"email": email},
+        {"$set": {"password_hash": password_hash}}
+    )
+
+async def update_password(email: str, password_hash: str) -> Optional[dict]:
+    """Set a new hash and return the updated principal in the same round trip"""
+    return await database.db.users.find_one_and_update(
+        {"email": email},
+        {"$set": {"password_hash": password_hash}},
+        projection=projections.USER_PRINCIPAL,
+        return_document=ReturnDocument.AFTER
+    )
+
+async def find_team_member(organization_id: str, member_id: ObjectId, projection: dict) -> Optional[dict]:
+    return await database.db.users.find_one(_team_member_filter(organization_id, member_id), projection)
+
+async def update_team_member(organization_id: str, member_id: ObjectId, update_ops: dict) -> Optional[dict]:
+    member = await database.db.users.find_one_and_update(
+        _team_member_filter(organization_id, member_id),
+        update_ops,
+        projection=projections.USER_LISTING_ROW,
+        return_document=ReturnDocument.AFTER
+    )
+    if member:
+        local_change("users", "update", member)
+        await bump_versions(*user_scopes(organization_id))
+    return member
+
+async def find_team_members(organization_id: str, member_ids: List[ObjectId], projection: dict) -> List[dict]:
+    return await database.db.users.find(_team_member_filter(organization_id, member_ids), projection).to_list(None)
+
+async def bulk_update_team_members(organization_id: str, changes: List[tuple]) -> List[dict]:
+    """Apply ``(pre_image, update_ops)`` pairs in one unordered bulk_write.
+
+    Post-images are derived from the pre-images rather than read back; only
+    if some member vanished in between are the survivors re-read.
+    """
+    result = await database.db.users.bulk_write(
+        [UpdateOne(_team_member_filter(organization_id, before["_id"]), update_ops) for before, update_ops in changes],
+        ordered=False
+    )
+    if result.matched_count == len(changes):
+        members = []
+        for before, update_ops in changes:
+            after = {**before, **update_ops.get("$set", {})}
+            for field, amount in update_ops.get("$inc", {}).items():
+                after[field] = after.get(field, 0) + amount
+            members.append(after)
+    else:
+        members = await find_team_members(
+            organization_id, [before["_id"] for before, _ in changes], projections.USER_LISTING_ROW
+        )
+    for member in members:
+        local_change("users", "update", member)
+    await bump_versions(*user_scopes(organization_id))
+    return members
+
+async def delete_team_member(organization_id: str, member_id: ObjectId) -> Optional[dict]:
+    """Delete a team member and return its role and active flag (for org_stats)"""
+    member = await database.db.users.find_one_and_delete(
+        _team_member_filter(organization_id, member_id),
+        projection=projections.MEMBERSHIP
+    )
+    if member:
+        local_change("users", "delete", {**member, "organization_id": organization_id})
+        await bump_versions(*user_scopes(organization_id))
+    return member
+
+async def delete_team_members(organization_id: str, member_ids: List[ObjectId]) -> Tuple[List[dict], Optional[Exception]]:
+    """Delete team members; return the role and active flag of each one removed, and the first error.
+
+    Deletions that succeeded are returned (and published) even when another
+    one failed, so the caller can account for them before raising the error.
+    """
+    limit = asyncio.Semaphore(settings.BULK_DELETE_CONCURRENCY)
+
+    async def delete_one(member_id: ObjectId):
+        # One find_one_and_delete per id, so every pre-image belongs to a deletion
+        # this call made; ids a concurrent request deleted first come back as None
+        async with limit:
+            return await database.db.users.find_one_and_delete(
+                _team_member_filter(organization_id, member_id), projection=projections.MEMBERSHIP
+            )
+
+    results = await asyncio.gather(
+        *(delete_one(member_id) for member_id in dict.fromkeys(member_ids)),
+        return_exceptions=True
+    )
+    members = [result for result in results if result and not isinstance(result, BaseException)]
+    error = next((result for result in results if isinstance(result, BaseException)), None)
+    for member in members:
+        local_change("users", "delete", {**member, "organization_id": organization_id})
+    if members:
+        await bump_versions(*user_scopes(organization_id))
+    return members, error
+
+async def delete_user(user_id: ObjectId, organization_id: Optional[str] = None):
+    await database.db.users.delete_one({"_id": user_id})
+    await bump_versions(*user_scopes(organization_id))
@@ -1,21 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.security import HTTPBearer
-from schemas.users import UserInDB, UserCreate
+from schemas.users import UserInDB, UserCreate, TokenClaims, OrgStats
 from utils.security import (
-    get_current_user, 
+    get_current_claims, 
     generate_random_password, 
     send_credentials_email,
-    get_password_hash,
-    send_role_change_email
+    get_password_hash_async,
+    send_role_change_email,
+    send_role_change_emails,
+    invalidate_principal,
+    invalidate_principals_by_id
 )
+from config import settings
 from db import database
-from typing import List, Optional
+from utils import projections
+from repositories import users as users_repo
+from repositories import organizations as organizations_repo
+from repositories import org_stats as org_stats_repo
+from typing import List, Optional, Union
+from utils.events import event_stream_response, organization_topic
+from utils.etags import etag_headers, not_modified, organization_users_scope, scope_etag, stats_etag
+from utils.response_cache import response_cache
+from utils.pagination import Page, PageParams, page_params, paginate
+from utils.raw_bson import inflate, raw_reads
+from utils.log import get_logger
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+import asyncio
 
 router = APIRouter()
 security = HTTPBearer()
+logger = get_logger("admin")
 
 class TeamMemberCreate(BaseModel):
     first_name: str
@@ -30,11 +47,24 @@ class TeamMemberUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 class BulkDeleteRequest(BaseModel):
-    member_ids: List[str]
+    member_ids: List[str] = Field(..., max_length=settings.BULK_DELETE_MAX_IDS)
 
-@router.get("/team-members", response_model=List[UserInDB])
+class BulkUpdateItem(TeamMemberUpdate):
+    member_id: str
+
+class BulkUpdateRequest(BaseModel):
+    updates: List[BulkUpdateItem]
+
+class BulkUpdateResponse(BaseModel):
+    updated: List[UserInDB]
+    not_found: List[str]
+
+@router.get("/team-members", response_model=Union[Page[UserInDB], List[UserInDB]])
 async def list_team_members(
-    current_user: UserInDB = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(page_params),
+    current_user: TokenClaims = Depends(get_current_claims)
 ):
     # Verify admin permissions
     if current_user.role not in ["superadmin", "admin"]:
@@ -43,26 +73,36 @@ async def list_team_members(
             detail="Only admins can view team members"
         )
     
+    # Rendered bodies are cached per organization and served while the ETag holds
+    scope = organization_users_scope(current_user.organization_id)
+    etag = await scope_etag(request, scope)
+    cache_key = response_cache.key(request, current_user.organization_id)
+    cached = not_modified(request, response, etag) or response_cache.serve(cache_key, etag, etag_headers(etag))
+    if cached:
+        return cached
+    
+    query = {
+        "organization_id": current_user.organization_id,
+        "role": {"$in": ["compliance_team", "it_team", "management_team"]}
+    }
+
+    if not page.legacy:
+        docs, next_cursor, total = await paginate(raw_reads(database.db.users), query, projections.USER_LISTING_ROW, page)
+        result = Page(items=[UserInDB.from_mongo_trusted(inflate(doc)) for doc in docs], next_cursor=next_cursor, total=total)
+        return response_cache.store(cache_key, etag, [scope], result, etag_headers(etag))
+
     # Get all team members for the organization
-    team_members = await database.db.users.find(
-        {
-            "organization_id": current_user.organization_id,
-            "role": {"$in": ["compliance_team", "it_team", "management_team"]}
-        }
-    ).to_list(None)
+    team_members = await raw_reads(database.db.users).find(query, projections.USER_LISTING_ROW).to_list(None)
     
-    # Convert MongoDB documents
-    converted_members = []
-    for member in team_members:
-        member["_id"] = str(member["_id"])
-        converted_members.append(UserInDB(**member))
+    # Rows we wrote ourselves skip validation; see utils/responses.py
+    converted_members = [UserInDB.from_mongo_trusted(inflate(member)) for member in team_members]
     
-    return converted_members
+    return response_cache.store(cache_key, etag, [scope], converted_members, etag_headers(etag))
 
 @router.post("/create-team-member", response_model=UserInDB)
 async def create_team_member(
     user_data: TeamMemberCreate,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: TokenClaims = Depends(get_current_claims)
 ):
     # Verify admin permissions and get organization
     if current_user.role != "admin":
@@ -85,37 +125,35 @@ async def create_team_member(
             detail=f"Invalid role. Must be one of: {', '.join(valid_roles)}"
         )
     
-    # Check if email exists
-    if await database.db.users.find_one({"email": user_data.email}):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
-    
-    # Get organization details
     try:
         org_id = ObjectId(current_user.organization_id)
-        org = await database.db.organizations.find_one({"_id": org_id})
-        if not org:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Organization not found"
-            )
-    except:
+    except Exception:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid organization ID format"
         )
-    
+
     # Generate random password
     temp_password = generate_random_password()
-    
+
+    # The organization lookup and the hash don't depend on each other;
+    # a taken email is caught by the unique index on insert
+    org, password_hash = await asyncio.gather(
+        organizations_repo.find_by_id(org_id, projections.ORGANIZATION_NAME),
+        get_password_hash_async(temp_password)
+    )
+    if not org:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Organization not found"
+        )
+
     # Create team member
     user_dict = {
         "first_name": user_data.first_name,
         "last_name": user_data.last_name,
         "email": user_data.email,
-        "password_hash": get_password_hash(temp_password),
+        "password_hash": password_hash,
         "role": user_data.role,
         "organization_id": str(org_id),
         "created_by": current_user.id,
@@ -123,23 +161,17 @@ async def create_team_member(
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     }
-    
-    # Insert the user
-    result = await database.db.users.insert_one(user_dict)
-    if not result.acknowledged:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to create team member"
-        )
-    
-    # Get the created user
-    created_user = await database.db.users.find_one({"_id": result.inserted_id})
-    if not created_user:
+
+    # Insert the user; the response is built from the inserted document
+    try:
+        created_user = await users_repo.insert_user(user_dict)
+    except DuplicateKeyError:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to retrieve created user"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
         )
-    
+    await org_stats_repo.record_member_added(created_user["organization_id"], created_user)
+
     # Send email with credentials
     try:
         await send_credentials_email(
@@ -153,16 +185,14 @@ async def create_team_member(
         )
     except Exception as e:
         # Log the error but don't fail the operation
-        print(f"Failed to send email: {str(e)}")
+        logger.warning("Failed to queue credentials email: %s", e)
     
-    # Convert the user document to UserInDB model
-    created_user["_id"] = str(created_user["_id"])
-    return UserInDB(**created_user)
+    return UserInDB.from_mongo(created_user)
 
 @router.delete("/team-members/{member_id}")
 async def delete_team_member(
     member_id: str,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: TokenClaims = Depends(get_current_claims)
 ):
     # Verify admin permissions
     if current_user.role != "admin":
@@ -181,24 +211,22 @@ async def delete_team_member(
         )
     
     # Find and delete the team member
-    result = await database.db.users.delete_one({
-        "_id": obj_id,
-        "organization_id": current_user.organization_id,
-        "role": {"$in": ["compliance_team", "it_team", "management_team"]}
-    })
+    deleted = await users_repo.delete_team_member(current_user.organization_id, obj_id)
     
-    if result.deleted_count == 0:
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Team member not found or not authorized to delete"
         )
     
+    await org_stats_repo.record_members_removed(current_user.organization_id, [deleted])
+    invalidate_principals_by_id([member_id])
     return {"message": "Team member deleted successfully"}
 
 @router.post("/team-members/bulk-delete")
 async def bulk_delete_team_members(
     request: BulkDeleteRequest,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: TokenClaims = Depends(get_current_claims)
 ):
     # Verify admin permissions
     if current_user.role != "admin":
@@ -217,25 +245,130 @@ async def bulk_delete_team_members(
         )
     
     # Delete multiple team members
-    result = await database.db.users.delete_many({
-        "_id": {"$in": obj_ids},
-        "organization_id": current_user.organization_id,
-        "role": {"$in": ["compliance_team", "it_team", "management_team"]}
-    })
-    
-    if result.deleted_count == 0:
+    deleted, error = await users_repo.delete_team_members(current_user.organization_id, obj_ids)
+    deleted_count = len(deleted)
+
+    # Account for whatever was deleted before surfacing a partial failure
+    if deleted:
+        await org_stats_repo.record_members_removed(current_user.organization_id, deleted)
+        invalidate_principals_by_id([str(member["_id"]) for member in deleted])
+    if error is not None:
+        raise error
+
+    if deleted_count == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No team members found or not authorized to delete"
         )
     
-    return {"message": f"Successfully deleted {result.deleted_count} team members"}
+    return {"message": f"Successfully deleted {deleted_count} team members"}
+
+# Declared before /team-members/{member_id} so "bulk" isn't taken for an id
+@router.patch("/team-members/bulk", response_model=BulkUpdateResponse)
+async def bulk_update_team_members(
+    request: BulkUpdateRequest,
+    current_user: TokenClaims = Depends(get_current_claims)
+):
+    # Verify admin permissions
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only organization admins can update team members"
+        )
+    
+    updates = {}
+    for item in request.updates:
+        try:
+            obj_id = ObjectId(item.member_id)
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid member ID format"
+            )
+        if obj_id in updates:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Member {item.member_id} appears more than once"
+            )
+        update_dict = item.model_dump(exclude={"member_id"}, exclude_none=True)
+        if not update_dict:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"No valid update data provided for member {item.member_id}"
+            )
+        if "role" in update_dict and update_dict["role"] not in users_repo.TEAM_ROLES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid role. Must be one of: {', '.join(users_repo.TEAM_ROLES)}"
+            )
+        updates[obj_id] = update_dict
+    
+    if not updates:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No updates provided"
+        )
+    
+    # Every pre-image in one $in query
+    members = await users_repo.find_team_members(
+        current_user.organization_id, list(updates), projections.USER_LISTING_ROW
+    )
+    found = {member["_id"]: member for member in members}
+    not_found = [str(obj_id) for obj_id in updates if obj_id not in found]
+    
+    now = datetime.utcnow()
+    changes = []
+    for obj_id, before in found.items():
+        update_dict = {**updates[obj_id], "updated_at": now}
+        update_ops = {"$set": update_dict}
+        # Role or activation changes revoke outstanding tokens
+        if any(field in update_dict and update_dict[field] != before.get(field) for field in ("role", "is_active")):
+            update_ops["$inc"] = {"token_version": 1}
+        changes.append((before, update_ops))
+    
+    updated = await users_repo.bulk_update_team_members(current_user.organization_id, changes) if changes else []
+    
+    for member in updated:
+        invalidate_principal(member["email"], str(member["_id"]))
+    await org_stats_repo.record_members_changed(
+        current_user.organization_id,
+        [(found[member["_id"]], member) for member in updated]
+    )
+    
+    # Role change notifications go out as one batch
+    role_changes = [
+        {
+            "email": member["email"],
+            "first_name": member["first_name"],
+            "last_name": member["last_name"],
+            "old_role": found[member["_id"]]["role"],
+            "new_role": member["role"],
+        }
+        for member in updated
+        if member["role"] != found[member["_id"]]["role"]
+    ]
+    if role_changes:
+        try:
+            org = await organizations_repo.find_by_id(
+                ObjectId(current_user.organization_id),
+                projections.ORGANIZATION_NAME
+            )
+            if org:
+                await send_role_change_emails(role_changes, org["name"])
+        except Exception as e:
+            # Log the error but don't fail the operation
+            logger.warning("Failed to queue role change emails: %s", e)
+    
+    return BulkUpdateResponse(
+        updated=[UserInDB.from_mongo(member) for member in updated],
+        not_found=not_found
+    )
 
 @router.patch("/team-members/{member_id}", response_model=UserInDB)
 async def update_team_member(
     member_id: str,
     update_data: TeamMemberUpdate,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: TokenClaims = Depends(get_current_claims)
 ):
     # Verify admin permissions
     if current_user.role != "admin":
@@ -254,11 +387,9 @@ async def update_team_member(
         )
     
     # Get the current team member data
-    current_member = await database.db.users.find_one({
-        "_id": obj_id,
-        "organization_id": current_user.organization_id,
-        "role": {"$in": ["compliance_team", "it_team", "management_team"]}
-    })
+    current_member = await users_repo.find_team_member(
+        current_user.organization_id, obj_id, projections.USER_CONTACT
+    )
     
     if not current_member:
         raise HTTPException(
@@ -276,17 +407,14 @@ async def update_team_member(
     
     # Add updated_at timestamp
     update_dict["updated_at"] = datetime.utcnow()
+
+    update_ops = {"$set": update_dict}
+    # Role or activation changes revoke outstanding tokens
+    if any(field in update_dict and update_dict[field] != current_member.get(field) for field in ("role", "is_active")):
+        update_ops["$inc"] = {"token_version": 1}
     
     # Update the team member
-    result = await database.db.users.find_one_and_update(
-        {
-            "_id": obj_id,
-            "organization_id": current_user.organization_id,
-            "role": {"$in": ["compliance_team", "it_team", "management_team"]}
-        },
-        {"$set": update_dict},
-        return_document=True
-    )
+    result = await users_repo.update_team_member(current_user.organization_id, obj_id, update_ops)
     
     if not result:
         raise HTTPException(
@@ -294,11 +422,17 @@ async def update_team_member(
             detail="Team member not found or not authorized to update"
         )
     
+    invalidate_principal(result["email"], member_id)
+    await org_stats_repo.record_member_changed(current_user.organization_id, current_member, result)
+
     # If role was changed, send notification email
     if "role" in update_dict and update_dict["role"] != current_member["role"]:
         try:
             # Get organization details
-            org = await database.db.organizations.find_one({"_id": ObjectId(current_user.organization_id)})
+            org = await organizations_repo.find_by_id(
+                ObjectId(current_user.organization_id),
+                projections.ORGANIZATION_NAME
+            )
             if org:
                 await send_role_change_email(
                     email=current_member["email"],
@@ -310,8 +444,49 @@ async def update_team_member(
                 )
         except Exception as e:
             # Log the error but don't fail the operation
-            print(f"Failed to send role change email: {str(e)}")
+            logger.warning("Failed to queue role change email: %s", e)
     
     # Convert to UserInDB model
-    result["_id"] = str(result["_id"])
-    return UserInDB(**result)
\ No newline at end of file
+    return UserInDB.from_mongo(result)
+
+@router.get("/stats", response_model=OrgStats)
+async def get_organization_stats(
+    request: Request,
+    response: Response,
+    current_user: TokenClaims = Depends(get_current_claims)
+):
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only organization admins can view organization stats"
+        )
+    
+    if not current_user.organization_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't belong to any organization"
+        )
+    
+    # One document read, maintained incrementally by the membership writes
+    stats = await org_stats_repo.find_stats(current_user.organization_id)
+    cached = not_modified(request, response, stats_etag(request, stats))
+    if cached:
+        return cached
+    return OrgStats.from_mongo(stats, current_user.organization_id)
+
+@router.get("/events")
+async def stream_organization_events(current_user: TokenClaims = Depends(get_current_claims)):
+    """Server-sent events for inserts, updates and deletes of the organization's users"""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only organization admins can subscribe to team events"
+        )
+    
+    if not current_user.organization_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't belong to any organization"
+        )
+    
+    return event_stream_response(organization_topic(current_user.organization_id))
@@ -1,29 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta
 from pydantic import BaseModel
 from utils.security import (
     authenticate_user,
     create_access_token,
+    build_token_claims,
     get_current_user,
-    get_password_hash,
-    verify_password,
+    get_password_hash_async,
+    verify_password_async,
     generate_random_password,
-    send_forgot_password_email
+    send_forgot_password_email,
+    invalidate_principal
 )
 from schemas.users import UserInDB, PasswordChange
 from config import settings
-from db import database
+from utils.rate_limit import rate_limiter
+from utils.etags import make_etag, not_modified
+from utils import projections
+from repositories import users as users_repo
+from utils.log import get_logger
 
 router = APIRouter()
+logger = get_logger("auth")
 
 class ForgotPasswordRequest(BaseModel):
     email: str
 
 @router.post("/forgot-password")
-async def forgot_password(request: ForgotPasswordRequest):
+async def forgot_password(request: ForgotPasswordRequest, http_request: Request):
+    # Throttle before any lookup, hashing or mail work
+    await rate_limiter.check_forgot_password(http_request, request.email)
+
     # Find user by email
-    user = await database.db.users.find_one({"email": request.email})
+    user = await users_repo.find_by_email(request.email, projections.USER_CONTACT)
     
     if not user:
         # Return success even if user not found for security
@@ -33,13 +43,10 @@ async def forgot_password(request: ForgotPasswordRequest):
     new_password = generate_random_password()
     
     # Hash the new password
-    hashed_password = get_password_hash(new_password)
+    hashed_password = await get_password_hash_async(new_password)
     
     # Update user's password in database
-    await database.db.users.update_one(
-        {"email": request.email},
-        {"$set": {"password_hash": hashed_password}}
-    )
+    await users_repo.set_password_hash(request.email, hashed_password)
     
     try:
         # Send email with new credentials using the forgot password template
@@ -52,14 +59,17 @@ async def forgot_password(request: ForgotPasswordRequest):
         )
         return {"message": "If an account exists with this email, you will receive your credentials shortly."}
     except Exception as e:
-        print(f"Error sending email: {str(e)}")
+        logger.error("Failed to queue forgot-password email: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to send email"
         )
 
 @router.post("/login", response_model=dict)
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    # Throttle before any lookup or hashing
+    await rate_limiter.check_login(request, form_data.username)
+
     user = await authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
@@ -70,13 +80,22 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email, "role": user.role},  # Include role in token
+        data=build_token_claims(user),
         expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserInDB)
-async def read_users_me(current_user: UserInDB = Depends(get_current_user)):
+async def read_users_me(
+    request: Request,
+    response: Response,
+    current_user: UserInDB = Depends(get_current_user)
+):
+    # Profile edits bump updated_at, role/activation changes bump token_version
+    etag = make_etag(request, current_user.id, current_user.updated_at, current_user.token_version)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
     return current_user
 
 @router.put("/profile", response_model=UserInDB)
@@ -84,39 +103,28 @@ async def update_profile(
     password_change: PasswordChange,
     current_user: UserInDB = Depends(get_current_user)
 ):
-    print(f"Received profile update request for user: {current_user.email}")
-    
     # Get user from database by email
-    user = await database.db.users.find_one({"email": current_user.email})
-    print(f"Found user in database: {user is not None}")
+    user = await users_repo.find_by_email(current_user.email, projections.CREDENTIAL_CHECK)
     
     if not user:
-        print(f"User not found in database for email: {current_user.email}")
+        logger.warning("Profile update for missing user", extra={"user_id": current_user.id})
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
 
     # Verify current password
-    if not verify_password(password_change.current_password, user["password_hash"]):
-        print("Current password verification failed")
+    if not await verify_password_async(password_change.current_password, user["password_hash"]):
+        logger.info("Profile update rejected: wrong current password", extra={"user_id": current_user.id})
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
 
-    print("Current password verified successfully")
-
-    # Update password
-    hashed_password = get_password_hash(password_change.new_password)
-    update_result = await database.db.users.update_one(
-        {"email": current_user.email},
-        {"$set": {"password_hash": hashed_password}}
-    )
-    print(f"Password update result: {update_result.modified_count} documents modified")
-
-    # Get updated user
-    updated_user = await database.db.users.find_one({"email": current_user.email})
-    print(f"Retrieved updated user: {updated_user is not None}")
+    # Update password and get the updated user back in the same round trip
+    hashed_password = await get_password_hash_async(password_change.new_password)
+    updated_user = await users_repo.update_password(current_user.email, hashed_password)
+    logger.info("Password changed", extra={"user_id": current_user.id})
+    invalidate_principal(current_user.email)
     
     return UserInDB.from_mongo(updated_user)
\ No newline at end of file
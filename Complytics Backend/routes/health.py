@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from db import database
+from utils.pool_metrics import pool_metrics
+
+router = APIRouter()
+
+@router.get("/live")
+async def liveness():
+    return {"status": "ok"}
+
+@router.get("/ready")
+async def readiness():
+    # A single ping on an already pooled connection; no collection access
+    if database.client is None or not await database.ping():
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unavailable", "pool": pool_metrics.snapshot()}
+        )
+    return {"status": "ok", "pool": pool_metrics.snapshot()}
@@ -1,44 +1,33 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer
-from schemas.users import UserCreate, PendingRegistration, UserInDB
+from schemas.users import UserCreate, PendingRegistration, UserInDB, TokenClaims
 from db import database
+from utils import projections
+from repositories import users as users_repo
+from repositories import organizations as organizations_repo
+from repositories import registrations as registrations_repo
+from repositories import org_stats as org_stats_repo
 from datetime import datetime
-from utils.security import generate_random_password, send_credentials_email, get_password_hash
-from utils.security import get_current_user
-from typing import List
+from utils.security import generate_random_password, send_credentials_email, get_password_hash_async
+from utils.security import get_current_claims
+from typing import List, Union
+from utils.pagination import Page, PageParams, page_params, paginate
+from utils.responses import FastJSONResponse
 from bson import ObjectId
-import json
-import traceback
+from pymongo.errors import DuplicateKeyError
+import asyncio
+import logging
+from utils.log import get_logger
 
 router = APIRouter()
+logger = get_logger("registration")
 security = HTTPBearer()
 
 @router.post("/register", response_model=dict)
 async def register_organization_admin(user_data: UserCreate):
     try:
-        # Debug: Log incoming registration attempt
-        print(f"\n[DEBUG] Registration attempt for: {user_data.email}")
-        print(f"Full user data: {user_data.model_dump()}")
-
-        # Check if email exists in either users or pending registrations
-        existing_user = await database.db.users.find_one({"email": user_data.email})
-        existing_pending = await database.db.pending_registrations.find_one(
-            {"user_data.email": user_data.email}
-        )
-
-        if existing_user:
-            print(f"[WARNING] Email already registered as user: {user_data.email}")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered"
-            )
-
-        if existing_pending:
-            print(f"[WARNING] Email already in pending registrations: {user_data.email}")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already pending approval"
-            )
+        # Never log the payload itself: it carries the registrant's password
+        logger.debug("Registration attempt", extra={"email": user_data.email})
 
         # Prepare the pending registration document
         pending_reg = {
@@ -49,97 +38,86 @@ async def register_organization_admin(user_data: UserCreate):
             "created_at": datetime.utcnow()
         }
 
-        print(f"\n[DEBUG] Prepared document for insertion:")
-        print(json.dumps(pending_reg, indent=2, default=str))
-
-        # Insert the document
-        result = await database.db.pending_registrations.insert_one(pending_reg)
-        
-        if not result.acknowledged:
-            print("[ERROR] Insert operation not acknowledged by MongoDB")
+        # Checked before the insert so a rejected email never shows up as a
+        # pending registration (or bumps its change version)
+        if await users_repo.find_by_email(user_data.email, projections.ID_ONLY):
+            logger.info("Registration rejected: email already registered", extra={"email": user_data.email})
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to save registration"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered"
             )
 
-        print(f"\n[SUCCESS] Inserted document with _id: {result.inserted_id}")
-
-        # Verify the inserted document
-        doc = await database.db.pending_registrations.find_one(
-            {"_id": result.inserted_id}
-        )
-        
-        if not doc:
-            print("[ERROR] Failed to verify inserted document")
+        # The unique index on user_data.email rejects a second pending registration
+        try:
+            registration = await registrations_repo.insert_pending(pending_reg)
+        except DuplicateKeyError:
+            logger.info("Registration rejected: email already pending", extra={"email": user_data.email})
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to verify registration"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already pending approval"
             )
 
-        print("\n[DEBUG] Verified inserted document:")
-        print(json.dumps(doc, indent=2, default=str))
-
-        # Immediate query check
-        pending_count = await database.db.pending_registrations.count_documents(
-            {"is_approved": False}
-        )
-        print(f"\n[STATUS] Current pending registrations count: {pending_count}")
+        logger.info("Registration submitted", extra={"registration_id": str(registration["_id"])})
 
         return {
             "message": "Registration submitted for approval. You'll receive an email once approved.",
-            "registration_id": str(result.inserted_id)
+            "registration_id": str(registration["_id"])
         }
 
     except HTTPException:
         # Re-raise HTTP exceptions we created
         raise
-    except Exception as e:
-        print(f"\n[CRITICAL] Unexpected error: {str(e)}")
-        print(f"Error type: {type(e).__name__}")
-        traceback.print_exc()  # Print full traceback
+    except Exception:
+        logger.exception("Registration failed unexpectedly")
         
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An unexpected error occurred during registration"
         )
         
-@router.get("/pending-registrations", response_model=List[PendingRegistration])
+@router.get("/pending-registrations", response_model=Union[Page[PendingRegistration], List[PendingRegistration]])
 async def get_pending_registrations(
-    current_user: UserInDB = Depends(get_current_user)
+    page: PageParams = Depends(page_params),
+    current_user: TokenClaims = Depends(get_current_claims)
 ):
-    print("\n[DEBUG] Entering get_pending_registrations")  # Debug log
-    print(f"Current user role: {current_user.role}")  # Debug log
-    
     if current_user.role != "superadmin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only superadmins can view pending registrations"
         )
     
-    # Debug: Count pending registrations before query
-    pending_count = await database.db.pending_registrations.count_documents(
-        {"is_approved": False}
-    )
-    print(f"[DEBUG] Found {pending_count} pending registrations")  # Debug log
+    if not page.legacy:
+        docs, next_cursor, total = await paginate(
+            database.db.pending_registrations, {"is_approved": False}, projections.PENDING_REGISTRATION_ROW, page
+        )
+        # Trusted reads without user_data.password; render them directly rather
+        # than through response_model, which would flag the missing field
+        return FastJSONResponse(Page[PendingRegistration](
+            items=[PendingRegistration.from_mongo_trusted(doc) for doc in docs],
+            next_cursor=next_cursor,
+            total=total
+        ))
+
+    # The extra count round trip is only worth paying when someone reads it
+    if logger.isEnabledFor(logging.DEBUG):
+        pending_count = await database.db.pending_registrations.count_documents({"is_approved": False})
+        logger.debug("Listing pending registrations", extra={"count": pending_count})
     
     # Get all pending registrations
     cursor = database.db.pending_registrations.find({"is_approved": False})
     pending = []
     
     async for doc in cursor:
-        print(f"\n[DEBUG] Raw MongoDB document:")  # Debug log
-        print(doc)  # Debug log
         # Convert MongoDB document
         doc["_id"] = str(doc["_id"])
         pending.append(doc)
     
-    print(f"\n[DEBUG] Returning {len(pending)} pending registrations")  # Debug log
     return pending
 
 @router.post("/approve-registration/{registration_id}", response_model=UserInDB)
 async def approve_registration(
     registration_id: str,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: TokenClaims = Depends(get_current_claims)
 ):
     try:
         # Convert string ID to ObjectId
@@ -150,84 +128,87 @@ async def approve_registration(
             detail="Invalid registration ID format"
         )
 
+    # Hash before taking the registration: the hash can fail with a 503 when
+    # the bcrypt queue is full, and the registration must survive that
+    temp_password = generate_random_password()
+    password_hash = await get_password_hash_async(temp_password)
+
     # Find and DELETE the pending registration in one atomic operation
-    pending = await database.db.pending_registrations.find_one_and_delete({"_id": obj_id})
+    pending = await registrations_repo.pop_pending(obj_id)
     if not pending:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Registration not found"
         )
     
-    # Check if user already exists
-    existing_user = await database.db.users.find_one({"email": pending["user_data"]["email"]})
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User with this email already exists"
-        )
-
-    try:
-        # Create organization first
-        org_data = {
-            "name": pending["user_data"]["organization_name"],
-            "domain": pending["user_data"]["organization_domain"],
-            "is_active": True,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow(),
-            "created_by": current_user.id
-        }
-        org_result = await database.db.organizations.insert_one(org_data)
-        
-        # Generate random password
-        temp_password = generate_random_password()
-        
-        # Create admin user
-        user_dict = pending["user_data"].copy()
-        user_dict["password_hash"] = get_password_hash(temp_password)
+    # The organization id is chosen up front so the admin user can be written
+    # without waiting for the organization insert; the unique index on
+    # users.email replaces the existence check
+    org_id = ObjectId()
+    org_data = {
+        "_id": org_id,
+        "name": pending["user_data"]["organization_name"],
+        "domain": pending["user_data"]["organization_domain"],
+        "is_active": True,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+        "created_by": current_user.id
+    }
+
+    async def create_admin_user():
+        # The registrant's plaintext password is never stored
+        user_dict = {key: value for key, value in pending["user_data"].items() if key != "password"}
+        user_dict["password_hash"] = password_hash
         user_dict["role"] = "admin"
-        user_dict["organization_id"] = str(org_result.inserted_id)
+        user_dict["organization_id"] = str(org_id)
         user_dict["is_active"] = True
         user_dict["created_at"] = datetime.utcnow()
         user_dict["updated_at"] = datetime.utcnow()
         user_dict["created_by"] = current_user.id
-        
-        # Create user (no need to update pending registration since we deleted it)
-        user_result = await database.db.users.insert_one(user_dict)
-        
-        # Get the created user
-        created_user = await database.db.users.find_one({"_id": user_result.inserted_id})
-        if not created_user:
+        # The response is built from the inserted document
+        return await users_repo.insert_user(user_dict)
+
+    org, created_user = await asyncio.gather(
+        organizations_repo.insert_organization(org_data),
+        create_admin_user(),
+        return_exceptions=True
+    )
+
+    if isinstance(org, Exception) or isinstance(created_user, Exception):
+        # Clean up any partially created data
+        if not isinstance(org, Exception):
+            await organizations_repo.delete_organization(org_id)
+        if not isinstance(created_user, Exception):
+            await users_repo.delete_user(created_user["_id"], created_user["organization_id"])
+
+        if isinstance(created_user, DuplicateKeyError):
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to retrieve created user"
-            )
-        
-        # Send email with credentials
-        try:
-            await send_credentials_email(
-                email=created_user["email"],
-                username=created_user["email"],
-                password=temp_password,
-                organization_name=org_data["name"],
-                first_name=created_user["first_name"],
-                last_name=created_user["last_name"],
-                role=created_user["role"]
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="User with this email already exists"
             )
-        except Exception as email_error:
-            # Log the email error but don't fail the whole operation
-            print(f"Failed to send email: {str(email_error)}")
-            # Consider adding to a retry queue in production
-        
-        return UserInDB.from_mongo(created_user)
-        
-    except Exception as e:
-        # Clean up any partially created data
-        if 'org_result' in locals():
-            await database.db.organizations.delete_one({"_id": org_result.inserted_id})
-        if 'user_result' in locals():
-            await database.db.users.delete_one({"_id": user_result.inserted_id})
-        
+        error = org if isinstance(org, Exception) else created_user
+        if isinstance(error, HTTPException):
+            raise error
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to approve registration: {str(e)}"
-        )
\ No newline at end of file
+            detail=f"Failed to approve registration: {str(error)}"
+        )
+
+    await org_stats_repo.record_member_added(created_user["organization_id"], created_user)
+
+    # Send email with credentials
+    try:
+        await send_credentials_email(
+            email=created_user["email"],
+            username=created_user["email"],
+            password=temp_password,
+            organization_name=org_data["name"],
+            first_name=created_user["first_name"],
+            last_name=created_user["last_name"],
+            role=created_user["role"]
+        )
+    except Exception as email_error:
+        # Log the email error but don't fail the whole operation
+        logger.warning("Failed to queue credentials email: %s", email_error)
+
+    return UserInDB.from_mongo(created_user)
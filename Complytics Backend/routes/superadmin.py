@@ -1,12 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from fastapi.security import HTTPBearer
-from schemas.users import UserCreate, UserInDB, OrganizationInDB
-from utils.security import get_current_user
+from schemas.users import UserCreate, UserInDB, OrganizationInDB, PendingRegistration, TokenClaims, OrgStats, PlatformStats
+from utils.security import get_current_claims
 from db import database
-from typing import List
-from utils.security import get_password_hash
+from utils import projections
+from repositories import users as users_repo
+from repositories import org_stats as org_stats_repo
+from typing import List, Optional, Union
+from pydantic import BaseModel
+from utils.pagination import KEYSET_SORT, Page, PageParams, page_params, paginate, encode_cursor
+from utils.events import event_stream_response, PENDING_REGISTRATIONS_TOPIC
+from utils.etags import (
+    etag_headers, make_etag, not_modified, scope_etag, stats_etag,
+    USERS_SCOPE, ORGANIZATIONS_SCOPE, PENDING_REGISTRATIONS_SCOPE
+)
+from utils.response_cache import response_cache
+from utils.responses import FastJSONResponse
+from utils.raw_bson import inflate, raw_reads
+from utils.export import export_response, USER_EXPORT_FIELDS, ORGANIZATION_EXPORT_FIELDS
+from utils.security import get_password_hash_async
 from datetime import datetime
+from config import settings
+from pymongo.errors import DuplicateKeyError
 from superadmin_deps import get_superadmin
+import asyncio
 
 
 router = APIRouter()
@@ -15,7 +32,7 @@ security = HTTPBearer()
 @router.post("/create-admin")
 async def create_admin_account(
     user_data: UserCreate,
-    current_user: UserInDB = Depends(get_superadmin)  # Changed here
+    current_user: TokenClaims = Depends(get_superadmin)  # Changed here
 ):
     # Verify superadmin permissions
     if current_user.role != "superadmin":
@@ -24,30 +41,32 @@ async def create_admin_account(
             detail="Only superadmins can create admin accounts"
         )
     
-    # Check if email already exists
-    if await database.db.users.find_one({"email": user_data.email}):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
-    
     # Create new admin user
     user_dict = user_data.model_dump(exclude={"password"})
-    user_dict["password_hash"] = get_password_hash(user_data.password)
+    user_dict["password_hash"] = await get_password_hash_async(user_data.password)
     user_dict["role"] = "admin"
     user_dict["created_by"] = current_user.id
     user_dict["is_active"] = True
     user_dict["created_at"] = datetime.utcnow()
     user_dict["updated_at"] = datetime.utcnow()
     
-    result = await database.db.users.insert_one(user_dict)
-    created_user = await database.db.users.find_one({"_id": result.inserted_id})
+    # The unique index on users.email rejects an address that is already taken
+    try:
+        created_user = await users_repo.insert_user(user_dict)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
     
-    return UserInDB.from_mongo(created_user)  # Updated line
+    return UserInDB.from_mongo(created_user)
 
-@router.get("/admins", response_model=List[UserInDB])
+@router.get("/admins", response_model=Union[Page[UserInDB], List[UserInDB]])
 async def list_all_admins(
-    current_user: UserInDB = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(page_params),
+    current_user: TokenClaims = Depends(get_current_claims)
 ):
     if current_user.role != "superadmin":
         raise HTTPException(
@@ -55,19 +74,33 @@ async def list_all_admins(
             detail="Only superadmins can view this list"
         )
     
-    admins = await database.db.users.find({"role": "admin"}).to_list(None)
+    # Rendered bodies are shared by all superadmins and served while the ETag holds
+    etag = await scope_etag(request, USERS_SCOPE)
+    cache_key = response_cache.key(request, "superadmin")
+    cached = not_modified(request, response, etag) or response_cache.serve(cache_key, etag, etag_headers(etag))
+    if cached:
+        return cached
     
-    # Convert MongoDB documents to UserInDB models properly
-    admin_list = []
-    for admin in admins:
-        admin['_id'] = str(admin['_id'])  # Convert ObjectId to string
-        admin_list.append(UserInDB(**admin))
+    if not page.legacy:
+        docs, next_cursor, total = await paginate(
+            raw_reads(database.db.users), {"role": "admin"}, projections.USER_LISTING_ROW, page
+        )
+        result = Page(items=[UserInDB.from_mongo_trusted(inflate(doc)) for doc in docs], next_cursor=next_cursor, total=total)
+        return response_cache.store(cache_key, etag, [USERS_SCOPE], result, etag_headers(etag))
+
+    admins = await raw_reads(database.db.users).find({"role": "admin"}, projections.USER_LISTING_ROW).to_list(None)
+    
+    # Rows we wrote ourselves skip validation; see utils/responses.py
+    admin_list = [UserInDB.from_mongo_trusted(inflate(admin)) for admin in admins]
     
-    return admin_list
+    return response_cache.store(cache_key, etag, [USERS_SCOPE], admin_list, etag_headers(etag))
 
-@router.get("/organizations/active", response_model=List[OrganizationInDB])
+@router.get("/organizations/active", response_model=Union[Page[OrganizationInDB], List[OrganizationInDB]])
 async def get_active_organizations(
-    current_user: UserInDB = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(page_params),
+    current_user: TokenClaims = Depends(get_current_claims)
 ):
     if current_user.role != "superadmin":
         raise HTTPException(
@@ -75,26 +108,188 @@ async def get_active_organizations(
             detail="Only superadmins can view organizations"
         )
     
-    orgs = await database.db.organizations.find(
-        {"is_active": True}
+    etag = await scope_etag(request, ORGANIZATIONS_SCOPE)
+    cache_key = response_cache.key(request, "superadmin")
+    cached = not_modified(request, response, etag) or response_cache.serve(cache_key, etag, etag_headers(etag))
+    if cached:
+        return cached
+    
+    if not page.legacy:
+        docs, next_cursor, total = await paginate(
+            raw_reads(database.db.organizations), {"is_active": True}, projections.ORGANIZATION_LISTING_ROW, page
+        )
+        result = Page(items=[OrganizationInDB.from_mongo_trusted(inflate(doc)) for doc in docs], next_cursor=next_cursor, total=total)
+        return response_cache.store(cache_key, etag, [ORGANIZATIONS_SCOPE], result, etag_headers(etag))
+
+    orgs = await raw_reads(database.db.organizations).find(
+        {"is_active": True},
+        projections.ORGANIZATION_LISTING_ROW
     ).to_list(length=None)
     
-    # Convert MongoDB documents to OrganizationInDB models properly
-    org_list = []
-    for org in orgs:
-        org['_id'] = str(org['_id'])  # Convert ObjectId to string
-        org_list.append(OrganizationInDB(**org))
+    # Rows we wrote ourselves skip validation; see utils/responses.py
+    org_list = [OrganizationInDB.from_mongo_trusted(inflate(org)) for org in orgs]
     
-    return org_list
+    return response_cache.store(cache_key, etag, [ORGANIZATIONS_SCOPE], org_list, etag_headers(etag))
 
-@router.get("/active-users", response_model=List[UserInDB])
+@router.get("/active-users", response_model=Union[Page[UserInDB], List[UserInDB]])
 async def get_active_users(
-    current_user: UserInDB = Depends(get_superadmin)
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(page_params),
+    current_user: TokenClaims = Depends(get_superadmin)
 ):
+    etag = await scope_etag(request, USERS_SCOPE)
+    cache_key = response_cache.key(request, "superadmin")
+    cached = not_modified(request, response, etag) or response_cache.serve(cache_key, etag, etag_headers(etag))
+    if cached:
+        return cached
+
+    if not page.legacy:
+        docs, next_cursor, total = await paginate(
+            raw_reads(database.db.users), {"is_active": True}, projections.USER_LISTING_ROW, page
+        )
+        result = Page(items=[UserInDB.from_mongo_trusted(inflate(doc)) for doc in docs], next_cursor=next_cursor, total=total)
+        return response_cache.store(cache_key, etag, [USERS_SCOPE], result, etag_headers(etag))
+
     # Get all active users (both admins and team members)
-    users = await database.db.users.find(
-        {"is_active": True}
+    users = await raw_reads(database.db.users).find(
+        {"is_active": True},
+        projections.USER_LISTING_ROW
     ).to_list(length=None)
     
-    # Convert MongoDB documents to UserInDB models
-    return [UserInDB.from_mongo(user) for user in users]
\ No newline at end of file
+    # Rows we wrote ourselves skip validation; see utils/responses.py
+    result = [UserInDB.from_mongo_trusted(inflate(user)) for user in users]
+    return response_cache.store(cache_key, etag, [USERS_SCOPE], result, etag_headers(etag))
+
+@router.get("/export/users")
+async def export_active_users(
+    fmt: str = Query("ndjson", alias="format"),
+    current_user: TokenClaims = Depends(get_superadmin)
+):
+    # Streamed straight from the cursor; memory stays flat regardless of collection size
+    return export_response(database.db.users, {"is_active": True}, USER_EXPORT_FIELDS, fmt, "active-users")
+
+@router.get("/export/organizations")
+async def export_active_organizations(
+    fmt: str = Query("ndjson", alias="format"),
+    current_user: TokenClaims = Depends(get_superadmin)
+):
+    return export_response(
+        database.db.organizations, {"is_active": True}, ORGANIZATION_EXPORT_FIELDS, fmt, "active-organizations"
+    )
+
+
+class DashboardResponse(BaseModel):
+    pending_registrations: Optional[Page[PendingRegistration]] = None
+    active_organizations: Optional[Page[OrganizationInDB]] = None
+    active_users: Optional[Page[UserInDB]] = None
+
+# section -> (collection, filter, projection, model, change scope)
+DASHBOARD_SECTIONS = {
+    "pending_registrations": (
+        "pending_registrations", {"is_approved": False}, projections.PENDING_REGISTRATION_ROW, PendingRegistration,
+        PENDING_REGISTRATIONS_SCOPE
+    ),
+    "active_organizations": (
+        "organizations", {"is_active": True}, projections.ORGANIZATION_LISTING_ROW, OrganizationInDB,
+        ORGANIZATIONS_SCOPE
+    ),
+    "active_users": ("users", {"is_active": True}, projections.USER_LISTING_ROW, UserInDB, USERS_SCOPE),
+}
+
+async def _dashboard_section(name: str, limit: int) -> Page:
+    collection, query, projection, model, _ = DASHBOARD_SECTIONS[name]
+    # $match and $sort sit ahead of the $facet so they can use the listing index;
+    # one round trip returns both the first page and the count
+    items = [{"$limit": limit + 1}]
+    if projection:
+        items.append({"$project": projection})
+    pipeline = [
+        {"$match": query},
+        {"$sort": dict(KEYSET_SORT)},
+        {"$facet": {"items": items, "total": [{"$count": "n"}]}},
+    ]
+    result = await database.db[collection].aggregate(pipeline).to_list(1)
+    facets = result[0] if result else {"items": [], "total": []}
+
+    docs = facets["items"]
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1])
+    return Page[model](
+        items=[model.from_mongo_trusted(doc) for doc in docs],
+        next_cursor=next_cursor,
+        total=facets["total"][0]["n"] if facets["total"] else 0
+    )
+
+@router.get("/dashboard", response_model=DashboardResponse, response_model_exclude_none=True)
+async def get_dashboard(
+    request: Request,
+    response: Response,
+    sections: Optional[str] = None,
+    limit: int = Query(settings.PAGINATION_DEFAULT_LIMIT, ge=1, le=settings.PAGINATION_MAX_LIMIT),
+    current_user: TokenClaims = Depends(get_superadmin)
+):
+    """All dashboard panels in one response; ``sections`` is a comma-separated subset"""
+    requested = list(DASHBOARD_SECTIONS)
+    if sections:
+        requested = [name.strip() for name in sections.split(",") if name.strip()]
+        unknown = [name for name in requested if name not in DASHBOARD_SECTIONS]
+        if unknown or not requested:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid sections. Must be any of: {', '.join(DASHBOARD_SECTIONS)}"
+            )
+
+    etag = await scope_etag(request, *(DASHBOARD_SECTIONS[name][4] for name in requested))
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+
+    # One aggregation per collection, all in flight together
+    pages = await asyncio.gather(*(_dashboard_section(name, limit) for name in requested))
+    # Sections were built from trusted reads; render them directly rather than revalidating.
+    # Pages render like the standalone list routes (None fields kept); only
+    # sections that weren't requested are left out.
+    return FastJSONResponse(
+        dict(zip(requested, pages)),
+        headers=etag_headers(etag)
+    )
+
+@router.get("/stats", response_model=PlatformStats)
+async def get_platform_stats(
+    request: Request,
+    response: Response,
+    current_user: TokenClaims = Depends(get_superadmin)
+):
+    # Sums one counter document per organization rather than counting users
+    totals = await org_stats_repo.platform_totals()
+    stats = PlatformStats(**totals[0]) if totals else PlatformStats()
+    cached = not_modified(request, response, make_etag(request, stats.organizations, stats.total, stats.active))
+    if cached:
+        return cached
+    return stats
+
+@router.get("/stats/{organization_id}", response_model=OrgStats)
+async def get_organization_stats(
+    organization_id: str,
+    request: Request,
+    response: Response,
+    current_user: TokenClaims = Depends(get_superadmin)
+):
+    stats = await org_stats_repo.find_stats(organization_id)
+    cached = not_modified(request, response, stats_etag(request, stats))
+    if cached:
+        return cached
+    return OrgStats.from_mongo(stats, organization_id)
+
+@router.post("/stats/reconcile")
+async def reconcile_stats(current_user: TokenClaims = Depends(get_superadmin)):
+    """Rebuild every organization's counters from the users collection"""
+    return await org_stats_repo.reconcile_org_stats()
+
+@router.get("/events")
+async def stream_superadmin_events(current_user: TokenClaims = Depends(get_superadmin)):
+    """Server-sent events for pending registrations: insert (new), delete (approved or withdrawn)"""
+    return event_stream_response(PENDING_REGISTRATIONS_TOPIC)
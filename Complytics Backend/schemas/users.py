@@ -1,6 +1,6 @@
 from enum import Enum
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 from bson import ObjectId
 from pydantic import field_validator
@@ -36,6 +36,13 @@ class OrganizationInDB(OrganizationBase):
         data["_id"] = str(data["_id"])
         return cls(**data)
 
+    @classmethod
+    def from_mongo_trusted(cls, data: dict):
+        """Build without validation, for documents this service wrote itself"""
+        if not data:
+            return None
+        return cls.model_construct(**{**data, "_id": str(data["_id"])})
+
 class UserBase(BaseModel):
     email: EmailStr
     first_name: str
@@ -56,6 +63,7 @@ class UserInDB(UserBase):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     created_by: Optional[str] = None
+    token_version: int = Field(default=0, exclude=True)
 
     @classmethod
     def from_mongo(cls, data: dict):
@@ -64,6 +72,21 @@ class UserInDB(UserBase):
         data["_id"] = str(data["_id"])
         return cls(**data)
 
+    @classmethod
+    def from_mongo_trusted(cls, data: dict):
+        """Build without validation, for documents this service wrote itself"""
+        if not data:
+            return None
+        return cls.model_construct(**{**data, "_id": str(data["_id"])})
+
+class TokenClaims(BaseModel):
+    """Authorization claims carried by the access token"""
+    id: str
+    email: str
+    role: UserRole
+    organization_id: Optional[str] = None
+    token_version: int = 0
+
 class PendingRegistration(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
     
@@ -85,6 +108,16 @@ class PendingRegistration(BaseModel):
             result["user_data"] = UserCreate(**result["user_data"])
         return cls(**result)
 
+    @classmethod
+    def from_mongo_trusted(cls, data: dict):
+        """Build without validation, for documents this service wrote itself"""
+        if not data:
+            return None
+        result = {**data, "_id": str(data["_id"])}
+        if isinstance(result.get("user_data"), dict):
+            result["user_data"] = UserCreate.model_construct(**result["user_data"])
+        return cls.model_construct(**result)
+
 class PasswordChange(BaseModel):
     current_password: str
     new_password: str = Field(..., min_length=8)
@@ -94,4 +127,28 @@ class PasswordChange(BaseModel):
     def passwords_match(cls, v, values):
         if 'new_password' in values.data and v != values.data['new_password']:
             raise ValueError('Passwords do not match')
-        return v
\ No newline at end of file
+        return v
+
+class RoleCount(BaseModel):
+    total: int = 0
+    active: int = 0
+
+class OrgStats(BaseModel):
+    """Membership counters for one organization (see repositories/org_stats.py)"""
+    organization_id: str
+    total: int = 0
+    active: int = 0
+    roles: Dict[str, RoleCount] = Field(default_factory=dict)
+    updated_at: Optional[datetime] = None
+
+    @classmethod
+    def from_mongo(cls, data: Optional[dict], organization_id: str):
+        # No document yet means nobody has joined
+        result = dict(data or {})
+        result.pop("_id", None)
+        return cls(organization_id=organization_id, **result)
+
+class PlatformStats(BaseModel):
+    organizations: int = 0
+    total: int = 0
+    active: int = 0
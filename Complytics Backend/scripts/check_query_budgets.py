@@ -0,0 +1,356 @@
+"""Fail if an endpoint issues more Mongo commands than its budget, or scans a collection.
+
+Every entry of BUDGETS is sent through the ASGI app in-process against a
+scratch database reseeded before each request (one organization with an
+admin and three team members, plus one pending registration). A command
+listener counts every command the request issues, round trips made by auth
+dependencies and ETag version reads included. Afterwards each recorded read
+or write is re-run through explain(), and a COLLSCAN in the winning plan
+fails the check unless the entry allows it for that collection.
+
+Budgets are for a cold process: the principal, token and response caches
+are cleared before each request. ``warm=True`` entries send the request
+once first, uncounted, to budget the cached path; ``conditional=True``
+ones also send the ETag back and expect 304.
+
+Run from the backend directory; the database is dropped before and after:
+
+    python scripts/check_query_budgets.py --database complytics_budget_check
+"""
+import argparse
+import asyncio
+import os
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import List, Optional
+from urllib.parse import urlencode
+
+import orjson
+from bson import ObjectId
+from pymongo import monitoring
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+from app import app  # noqa: E402
+from config import settings  # noqa: E402
+from db import database  # noqa: E402
+from repositories.org_stats import reconcile_org_stats  # noqa: E402
+from schemas.users import UserInDB  # noqa: E402
+from utils.hashing import apply_bcrypt_rounds, password_hasher, pwd_context  # noqa: E402
+from utils.indexes import reconcile_indexes, winning_plan_stages  # noqa: E402
+from utils.response_cache import response_cache  # noqa: E402
+from utils.security import (  # noqa: E402
+    build_token_claims, create_access_token, principal_cache, token_version_cache, verified_token_cache
+)
+
+PASSWORD = "budget-password"
+
+# Commands with no query plan to check
+UNPLANNED = {"insert", "getMore", "killCursors", "endSessions", "ping", "hello", "isMaster", "explain"}
+
+# Envelope fields explain() rejects or doesn't need
+ENVELOPE = {"lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "writeConcern", "readConcern"}
+
+
+class Budget:
+    def __init__(self, method: str, path: str, commands: int, as_user: Optional[str] = None,
+                 json=None, form=None, query=None, warm: bool = False, conditional: bool = False,
+                 allow_collscan=()):
+        self.method = method
+        self.path = path
+        self.commands = commands
+        self.as_user = as_user
+        self.json = json
+        self.form = form
+        self.query = query
+        self.warm = warm or conditional
+        self.conditional = conditional
+        self.allow_collscan = set(allow_collscan)
+
+    @property
+    def label(self) -> str:
+        label = f"{self.method} {self.path}"
+        if self.query:
+            label += "?" + urlencode(self.query)
+        if self.conditional:
+            label += " (If-None-Match)"
+        elif self.warm:
+            label += " (warm)"
+        return label
+
+
+# Streaming SSE routes never finish a response and are not listed
+BUDGETS = [
+    # auth
+    Budget("POST", "/auth/login", 1, form={"username": "member1@budget-org.com", "password": PASSWORD}),
+    Budget("POST", "/auth/forgot-password", 3, json={"email": "member1@budget-org.com"}),
+    Budget("GET", "/auth/me", 1, as_user="member1"),
+    Budget("GET", "/auth/me", 0, as_user="member1", warm=True),
+    Budget("PUT", "/auth/profile", 3, as_user="member1",
+           json={"current_password": PASSWORD, "new_password": "budget-password-2",
+                 "confirm_password": "budget-password-2"}),
+
+    # registration
+    Budget("POST", "/registration/register", 3, json={
+        "email": "owner@new-org.com", "first_name": "New", "last_name": "Owner", "password": PASSWORD,
+        "organization_name": "New Org", "organization_domain": "new-org.com",
+    }),
+    Budget("GET", "/registration/pending-registrations", 1, as_user="superadmin"),
+    Budget("GET", "/registration/pending-registrations", 1, as_user="superadmin", query={"limit": 50}),
+    Budget("POST", "/registration/approve-registration/{registration_id}", 8, as_user="superadmin"),
+
+    # superadmin
+    Budget("POST", "/superadmin/create-admin", 2, as_user="superadmin", json={
+        "email": "extra-admin@budget-org.com", "first_name": "Extra", "last_name": "Admin", "password": PASSWORD,
+    }),
+    Budget("GET", "/superadmin/admins", 2, as_user="superadmin"),
+    Budget("GET", "/superadmin/admins", 2, as_user="superadmin", query={"limit": 50}),
+    Budget("GET", "/superadmin/admins", 1, as_user="superadmin", warm=True),
+    Budget("GET", "/superadmin/admins", 1, as_user="superadmin", conditional=True),
+    Budget("GET", "/superadmin/organizations/active", 2, as_user="superadmin"),
+    Budget("GET", "/superadmin/organizations/active", 2, as_user="superadmin", query={"limit": 50}),
+    Budget("GET", "/superadmin/active-users", 2, as_user="superadmin"),
+    Budget("GET", "/superadmin/active-users", 3, as_user="superadmin", query={"limit": 50, "include_total": "true"}),
+    Budget("GET", "/superadmin/export/users", 1, as_user="superadmin"),
+    Budget("GET", "/superadmin/export/organizations", 1, as_user="superadmin", query={"format": "csv"}),
+    Budget("GET", "/superadmin/dashboard", 4, as_user="superadmin"),
+    Budget("GET", "/superadmin/stats", 1, as_user="superadmin", allow_collscan={"org_stats"}),
+    Budget("GET", "/superadmin/stats/{organization_id}", 1, as_user="superadmin"),
+    # Rebuilding every counter reads all users by design
+    Budget("POST", "/superadmin/stats/reconcile", 3, as_user="superadmin", allow_collscan={"users", "org_stats"}),
+
+    # admin
+    Budget("GET", "/admin/team-members", 3, as_user="admin"),
+    Budget("GET", "/admin/team-members", 3, as_user="admin", query={"limit": 50}),
+    Budget("POST", "/admin/create-team-member", 6, as_user="admin", json={
+        "first_name": "New", "last_name": "Member", "email": "member4@budget-org.com", "role": "it_team",
+    }),
+    Budget("PATCH", "/admin/team-members/{member1_id}", 7, as_user="admin", json={"role": "compliance_team"}),
+    Budget("PATCH", "/admin/team-members/bulk", 7, as_user="admin", json={"updates": [
+        {"member_id": "{member1_id}", "role": "compliance_team"},
+        {"member_id": "{member2_id}", "first_name": "Renamed"},
+    ]}),
+    Budget("DELETE", "/admin/team-members/{member1_id}", 4, as_user="admin"),
+    Budget("POST", "/admin/team-members/bulk-delete", 5, as_user="admin",
+           json={"member_ids": ["{member1_id}", "{member2_id}"]}),
+    Budget("GET", "/admin/stats", 2, as_user="admin"),
+
+    # health and operations
+    Budget("GET", "/health/live", 0),
+    Budget("GET", "/health/ready", 1),
+    Budget("GET", "/diagnostics/response-cache", 0, as_user="superadmin"),
+    Budget("GET", "/metrics", 0),
+]
+
+
+recording: ContextVar[Optional[List[dict]]] = ContextVar("recording", default=None)
+
+
+class CommandRecorder(monitoring.CommandListener):
+    """Appends every command started in a recording context to that context's list"""
+
+    def started(self, event):
+        commands = recording.get()
+        if commands is not None:
+            commands.append({"name": event.command_name, "database": event.database_name, "command": dict(event.command)})
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def seed(db) -> dict:
+    """Empty every collection (keeping its indexes) and write the fixture documents"""
+    for name in await db.list_collection_names():
+        await db[name].delete_many({})
+
+    now = datetime.utcnow()
+    password_hash = pwd_context.hash(PASSWORD)
+    org_id = ObjectId()
+    await db.organizations.insert_one({
+        "_id": org_id, "name": "Budget Org", "domain": "budget-org.com", "is_active": True,
+        "created_at": now, "updated_at": now, "created_by": "superadmin_unique_id",
+    })
+
+    users = {"admin": {
+        "_id": ObjectId(), "email": "admin@budget-org.com", "first_name": "Org", "last_name": "Admin", "role": "admin",
+    }}
+    for i in (1, 2, 3):
+        users[f"member{i}"] = {
+            "_id": ObjectId(), "email": f"member{i}@budget-org.com", "first_name": "Team", "last_name": f"Member{i}",
+            "role": "it_team",
+        }
+    for user in users.values():
+        user.update({
+            "password_hash": password_hash, "organization_id": str(org_id), "is_active": True, "token_version": 0,
+            "created_at": now, "updated_at": now, "created_by": "superadmin_unique_id",
+        })
+    await db.users.insert_many(list(users.values()))
+    await reconcile_org_stats(db)
+
+    registration_id = ObjectId()
+    await db.pending_registrations.insert_one({
+        "_id": registration_id,
+        "user_data": {
+            "email": "pending@pending-org.com", "first_name": "Pending", "last_name": "Owner",
+            "password": PASSWORD, "organization_name": "Pending Org", "organization_domain": "pending-org.com",
+        },
+        "is_approved": False, "approved_by": None, "approved_at": None, "created_at": now,
+    })
+
+    superadmin = UserInDB(
+        _id="superadmin_unique_id", email="superadmin@complytics.com", first_name="Super", last_name="Admin",
+        role="superadmin"
+    )
+    tokens = {"superadmin": create_access_token(build_token_claims(superadmin), timedelta(minutes=5))}
+    for name, user in users.items():
+        tokens[name] = create_access_token(build_token_claims(UserInDB.from_mongo(dict(user))), timedelta(minutes=5))
+
+    ids = {
+        "organization_id": str(org_id),
+        "registration_id": str(registration_id),
+        **{f"{name}_id": str(user["_id"]) for name, user in users.items()},
+    }
+    return {"ids": ids, "tokens": tokens}
+
+
+def fill(value, ids: dict):
+    """Substitute ``{member1_id}``-style placeholders anywhere in a path or body"""
+    if isinstance(value, str):
+        return value.format(**ids)
+    if isinstance(value, list):
+        return [fill(item, ids) for item in value]
+    if isinstance(value, dict):
+        return {key: fill(item, ids) for key, item in value.items()}
+    return value
+
+
+async def send(budget: Budget, fixture: dict, etag: Optional[str] = None) -> tuple:
+    """One request through the ASGI app; returns ``(status, headers)``"""
+    headers = []
+    body = b""
+    if budget.as_user:
+        headers.append((b"authorization", f"Bearer {fixture['tokens'][budget.as_user]}".encode()))
+    if budget.json is not None:
+        body = orjson.dumps(fill(budget.json, fixture["ids"]))
+        headers.append((b"content-type", b"application/json"))
+    elif budget.form is not None:
+        body = urlencode(budget.form).encode()
+        headers.append((b"content-type", b"application/x-www-form-urlencoded"))
+    if etag:
+        headers.append((b"if-none-match", etag.encode()))
+    headers.append((b"content-length", str(len(body)).encode()))
+
+    path = fill(budget.path, fixture["ids"])
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": budget.method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": urlencode(budget.query or {}).encode(), "headers": headers,
+        "client": ("127.0.0.1", 0), "server": ("budget-check", 80),
+    }
+    pending_body = [{"type": "http.request", "body": body, "more_body": False}]
+    response = {}
+
+    async def receive():
+        if pending_body:
+            return pending_body.pop()
+        return {"type": "http.disconnect"}
+
+    async def send_message(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {name.decode().lower(): value.decode() for name, value in message["headers"]}
+
+    await app(scope, receive, send_message)
+    return response["status"], response["headers"]
+
+
+def explainable(recorded: dict) -> List[dict]:
+    """The recorded command as one or more explain() targets (one per write statement)"""
+    command = {key: value for key, value in recorded["command"].items() if key not in ENVELOPE}
+    name = recorded["name"]
+    if name in UNPLANNED:
+        return []
+    for statements in ("updates", "deletes"):
+        if statements in command:
+            return [{**command, statements: [statement]} for statement in command[statements]]
+    return [command]
+
+
+async def check_plans(client, commands: List[dict], allow_collscan: set) -> List[str]:
+    problems = []
+    for recorded in commands:
+        for command in explainable(recorded):
+            collection = command[recorded["name"]]
+            explanation = await client[recorded["database"]].command("explain", command, verbosity="queryPlanner")
+            if "COLLSCAN" in winning_plan_stages(explanation) and collection not in allow_collscan:
+                problems.append(f"COLLSCAN on {collection} ({recorded['name']})")
+    return problems
+
+
+async def run_budget(client, db, budget: Budget) -> tuple:
+    fixture = await seed(db)
+    for cache in (principal_cache, token_version_cache, verified_token_cache, response_cache):
+        cache.clear()
+
+    etag = None
+    if budget.warm:
+        _, headers = await send(budget, fixture)
+        etag = headers.get("etag") if budget.conditional else None
+
+    commands = []
+    token = recording.set(commands)
+    try:
+        status_code, _ = await send(budget, fixture, etag)
+    finally:
+        recording.reset(token)
+
+    problems = []
+    expected = (304,) if budget.conditional else range(200, 300)
+    if status_code not in expected:
+        problems.append(f"status {status_code}")
+    if len(commands) > budget.commands:
+        problems.append(f"over budget: {', '.join(command['name'] for command in commands)}")
+    problems += await check_plans(client, commands, budget.allow_collscan)
+    return len(commands), problems
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", required=True, help="scratch database; dropped before and after the run")
+    args = parser.parse_args()
+    if args.database == settings.MONGODB_NAME:
+        parser.error("refusing to drop the configured MONGODB_NAME; pick a scratch database")
+
+    client = AsyncIOMotorClient(settings.MONGODB_URL, event_listeners=[CommandRecorder()])
+    database.client = client
+    database.db = client[args.database]
+    apply_bcrypt_rounds(4)
+    password_hasher.start()
+    try:
+        await client.drop_database(args.database)
+        report = await reconcile_indexes(database.db)
+        for label in report["errors"]:
+            print(f"index error: {label}")
+
+        failures = 0
+        for budget in BUDGETS:
+            count, problems = await run_budget(client, database.db, budget)
+            verdict = "FAIL" if problems else "ok"
+            print(f"{verdict:<5} {count:>2}/{budget.commands:<2} {budget.label}")
+            for problem in problems:
+                print(f"        {problem}")
+            failures += bool(problems)
+        return 1 if failures or report["errors"] else 0
+    finally:
+        await client.drop_database(args.database)
+        password_hasher.shutdown()
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
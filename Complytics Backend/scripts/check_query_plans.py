@@ -0,0 +1,41 @@
+"""Fail if any hot query shape would run as a collection scan.
+
+Reconciles the declared indexes on the configured database, then runs
+explain() on every entry of utils.indexes.QUERY_SHAPES and exits non-zero
+if a winning plan contains a COLLSCAN stage.
+
+Run from the backend directory against a scratch database:
+
+    MONGODB_NAME=complytics_plan_check python scripts/check_query_plans.py
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+from config import settings  # noqa: E402
+from utils.indexes import explain_query_shapes, reconcile_indexes  # noqa: E402
+
+
+async def main() -> int:
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.MONGODB_NAME]
+    try:
+        report = await reconcile_indexes(db)
+        for label in report["errors"]:
+            print(f"index error: {label}")
+
+        failures = 0
+        for result in await explain_query_shapes(db):
+            verdict = "COLLSCAN" if result["collscan"] else "ok"
+            print(f"{verdict:<9} {result['collection']:<22} {result['query']:<34} {' > '.join(result['stages'])}")
+            failures += result["collscan"]
+        return 1 if failures or report["errors"] else 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
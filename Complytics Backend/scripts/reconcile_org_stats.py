@@ -0,0 +1,33 @@
+"""Rebuild the org_stats membership counters from the users collection.
+
+The counters are maintained with $inc as members are created, updated and
+deleted; this recomputes them with one aggregation and replaces every
+document, correcting any drift. Safe to run repeatedly, e.g. nightly from
+cron.
+
+Run from the backend directory:
+
+    python scripts/reconcile_org_stats.py
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+from config import settings  # noqa: E402
+from repositories.org_stats import reconcile_org_stats  # noqa: E402
+
+
+async def main():
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    try:
+        report = await reconcile_org_stats(client[settings.MONGODB_NAME])
+        print(f"Rebuilt counters for {report['organizations']} organizations, removed {report['removed']} stale")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
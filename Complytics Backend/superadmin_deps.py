@@ -1,8 +1,8 @@
 from fastapi import Depends, HTTPException, status
-from schemas.users import UserInDB
-from utils.security import get_current_user
+from schemas.users import TokenClaims
+from utils.security import get_current_claims
 
-async def get_superadmin(current_user: UserInDB = Depends(get_current_user)):
+async def get_superadmin(current_user: TokenClaims = Depends(get_current_claims)):
     if current_user.role != "superadmin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
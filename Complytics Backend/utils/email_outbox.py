@@ -0,0 +1,255 @@
+import asyncio
+import smtplib
+import ssl
+import time
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import List
+from pymongo import ReturnDocument
+from config import settings
+from db import database
+from utils.log import get_logger
+from utils.metrics import record_phase
+
+logger = get_logger("email")
+
+
+class SMTPConnectionPool:
+    """Keeps authenticated SMTP sessions open and hands them out for reuse.
+
+    smtplib is blocking, so every method here is meant to run in a worker
+    thread. Idle sessions are health-checked with NOOP before reuse and
+    dropped once they exceed SMTP_CONNECTION_MAX_IDLE_SECONDS.
+    """
+
+    def __init__(self, max_idle_seconds: float):
+        self.max_idle_seconds = max_idle_seconds
+        self._idle = []
+        self.opened = 0
+        self.reused = 0
+
+    def _connect(self):
+        if settings.SMTP_USE_SSL:
+            context = ssl.create_default_context()
+            server = smtplib.SMTP_SSL(settings.SMTP_HOST, settings.SMTP_PORT, context=context, timeout=30)
+        else:
+            server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=30)
+        if settings.SMTP_USERNAME:
+            server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+        self.opened += 1
+        return server
+
+    def acquire(self):
+        while self._idle:
+            server, released_at = self._idle.pop()
+            if time.monotonic() - released_at > self.max_idle_seconds:
+                self._close(server)
+                continue
+            try:
+                if server.noop()[0] == 250:
+                    self.reused += 1
+                    return server
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close(server)
+        return self._connect()
+
+    def release(self, server):
+        self._idle.append((server, time.monotonic()))
+
+    def discard(self, server):
+        self._close(server)
+
+    def close_all(self):
+        while self._idle:
+            self._close(self._idle.pop()[0])
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+
+def _build_message(doc: dict) -> MIMEMultipart:
+    message = MIMEMultipart()
+    message["From"] = settings.SMTP_FROM_EMAIL
+    message["To"] = doc["to"]
+    message["Subject"] = doc["subject"]
+    message.attach(MIMEText(doc["html"], "html"))
+    return message
+
+
+class EmailOutboxWorker:
+    """Delivers queued ``email_outbox`` documents in the background.
+
+    Messages are claimed with a lease so a crashed worker's claims are picked
+    up again. Failures are retried with exponential backoff until
+    EMAIL_MAX_ATTEMPTS, after which the message is dead-lettered.
+    """
+
+    def __init__(self):
+        self.pool = SMTPConnectionPool(settings.SMTP_CONNECTION_MAX_IDLE_SECONDS)
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.enqueued = 0
+        self.sent = 0
+        self.failed_attempts = 0
+        self.dead_lettered = 0
+        self._delivery_seconds = 0.0
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.pool.close_all)
+
+    def notify(self):
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                while await self._deliver_next():
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Email outbox worker error")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.EMAIL_OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _claim(self):
+        now = datetime.utcnow()
+        return await database.db.email_outbox.find_one_and_update(
+            {
+                "status": {"$in": ["pending", "sending"]},
+                "next_attempt_at": {"$lte": now}
+            },
+            {
+                "$set": {
+                    "status": "sending",
+                    "next_attempt_at": now + timedelta(seconds=settings.EMAIL_SEND_LEASE_SECONDS)
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _deliver_next(self) -> bool:
+        doc = await self._claim()
+        if doc is None:
+            return False
+
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._send, doc)
+        except Exception as e:
+            await self._record_failure(doc, e)
+            return True
+        finally:
+            record_phase("smtp", time.perf_counter() - started)
+
+        sent_at = datetime.utcnow()
+        await database.db.email_outbox.update_one(
+            {"_id": doc["_id"]},
+            # Drop the body once delivered; it may contain credentials
+            {"$set": {"status": "sent", "sent_at": sent_at}, "$unset": {"html": ""}}
+        )
+        self.sent += 1
+        self._delivery_seconds += (sent_at - doc["created_at"]).total_seconds()
+        return True
+
+    def _send(self, doc: dict):
+        server = self.pool.acquire()
+        try:
+            server.send_message(_build_message(doc))
+        except Exception:
+            self.pool.discard(server)
+            raise
+        self.pool.release(server)
+
+    async def _record_failure(self, doc: dict, error: Exception):
+        self.failed_attempts += 1
+        if doc["attempts"] >= settings.EMAIL_MAX_ATTEMPTS:
+            self.dead_lettered += 1
+            # The body may carry a plaintext temporary password; keep only what's
+            # needed to diagnose the failure (to, subject, kind, last_error)
+            update = {"$set": {"status": "dead", "last_error": str(error)}, "$unset": {"html": ""}}
+            logger.error(
+                "Email dead-lettered: %s", error,
+                extra={"email_id": str(doc["_id"]), "to": doc["to"], "attempts": doc["attempts"]}
+            )
+        else:
+            backoff = min(
+                settings.EMAIL_RETRY_BASE_SECONDS * 2 ** (doc["attempts"] - 1),
+                settings.EMAIL_RETRY_MAX_SECONDS
+            )
+            update = {"$set": {
+                "status": "pending",
+                "last_error": str(error),
+                "next_attempt_at": datetime.utcnow() + timedelta(seconds=backoff)
+            }}
+        await database.db.email_outbox.update_one({"_id": doc["_id"]}, update)
+
+    def metrics(self) -> dict:
+        return {
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "failed_attempts": self.failed_attempts,
+            "dead_lettered": self.dead_lettered,
+            "avg_delivery_seconds": round(self._delivery_seconds / self.sent, 3) if self.sent else 0.0,
+            "smtp_connections_opened": self.pool.opened,
+            "smtp_connections_reused": self.pool.reused,
+        }
+
+
+email_worker = EmailOutboxWorker()
+
+
+def _outbox_doc(to: str, subject: str, html: str, kind: str) -> dict:
+    now = datetime.utcnow()
+    return {
+        "kind": kind,
+        "to": to,
+        "subject": subject,
+        "html": html,
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now,
+    }
+
+async def enqueue_email(to: str, subject: str, html: str, kind: str):
+    """Persist an email for background delivery and wake the worker"""
+    await database.db.email_outbox.insert_one(_outbox_doc(to, subject, html, kind))
+    email_worker.enqueued += 1
+    email_worker.notify()
+
+async def enqueue_emails(messages: List[dict], kind: str):
+    """Persist a batch of ``{"to", "subject", "html"}`` messages in one insert.
+
+    The worker delivers them back to back over one pooled SMTP session.
+    """
+    if not messages:
+        return
+    await database.db.email_outbox.insert_many(
+        [_outbox_doc(message["to"], message["subject"], message["html"], kind) for message in messages]
+    )
+    email_worker.enqueued += len(messages)
+    email_worker.notify()
@@ -0,0 +1,82 @@
+"""Conditional GETs backed by per-scope change counters.
+
+Every repository write bumps the ``version`` of the scopes it affects in
+the ``change_versions`` collection (``_id`` is the scope name, so reads are
+a covered ``_id`` lookup). A list route reads its scopes' versions before
+querying; if the client's ``If-None-Match`` already names that ETag, it
+answers 304 without running the query or serializing anything.
+
+Versions are read before the data, so a write that lands in between makes
+the ETag older than the body, never newer; the next request refetches.
+"""
+import hashlib
+from typing import List, Optional
+from fastapi import Request, Response, status
+from pymongo import UpdateOne
+from db import database
+from utils.response_cache import response_cache
+
+USERS_SCOPE = "users"
+ORGANIZATIONS_SCOPE = "organizations"
+PENDING_REGISTRATIONS_SCOPE = "pending_registrations"
+
+
+def organization_users_scope(organization_id: str) -> str:
+    return f"users:{organization_id}"
+
+def user_scopes(organization_id: Optional[str]) -> List[str]:
+    """Scopes touched by a write to one user"""
+    if organization_id:
+        return [USERS_SCOPE, organization_users_scope(organization_id)]
+    return [USERS_SCOPE]
+
+
+async def bump_versions(*scopes: str):
+    if not scopes:
+        return
+    response_cache.invalidate(scopes)
+    await database.db.change_versions.bulk_write(
+        [UpdateOne({"_id": scope}, {"$inc": {"version": 1}}, upsert=True) for scope in scopes],
+        ordered=False
+    )
+
+async def read_versions(scopes: List[str]) -> dict:
+    docs = await database.db.change_versions.find({"_id": {"$in": scopes}}).to_list(len(scopes))
+    versions = {doc["_id"]: doc["version"] for doc in docs}
+    return {scope: versions.get(scope, 0) for scope in scopes}
+
+
+def _if_none_match(request: Request) -> List[str]:
+    header = request.headers.get("if-none-match", "")
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+def make_etag(request: Request, *parts) -> str:
+    # The query string is part of the key: each page or variant is its own representation
+    seed = "|".join([request.url.path, str(request.query_params), *map(str, parts)])
+    return f'W/"{hashlib.sha1(seed.encode()).hexdigest()[:20]}"'
+
+def etag_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Set the validator on ``response``; return a bodiless 304 if the client already has it"""
+    headers = etag_headers(etag)
+    response.headers.update(headers)
+    tags = _if_none_match(request)
+    if etag in tags or "*" in tags:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
+
+async def scope_etag(request: Request, *scopes: str) -> str:
+    """One covered read of the scopes' versions, folded into an ETag"""
+    versions = await read_versions(list(scopes))
+    return make_etag(request, *(f"{scope}={version}" for scope, version in versions.items()))
+
+async def check_scopes(request: Request, response: Response, *scopes: str) -> Optional[Response]:
+    return not_modified(request, response, await scope_etag(request, *scopes))
+
+def stats_etag(request: Request, stats: Optional[dict]) -> str:
+    # Tag the counters themselves: they're updated after the member write, so a
+    # scope version could be bumped before the counters it should describe
+    stats = stats or {}
+    return make_etag(request, stats.get("updated_at"), stats.get("total"), stats.get("active"), stats.get("roles"))
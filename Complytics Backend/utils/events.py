@@ -0,0 +1,276 @@
+"""Live change events for the dashboards, delivered as server-sent events.
+
+Events come from one database-level change stream over ``users`` and
+``pending_registrations``. A standalone mongod has no change streams; there
+the repositories publish their own writes in-process instead (``local``
+mode), which only reaches clients connected to the same worker process.
+
+Passwords never leave the database: the change stream pipeline projects
+them out, and published documents are reduced to listing fields.
+"""
+import asyncio
+import json
+from datetime import datetime
+from typing import AsyncIterator, Optional
+from bson import ObjectId
+from fastapi.responses import StreamingResponse
+from pymongo.errors import OperationFailure, PyMongoError
+from config import settings
+from db import database
+from utils.log import get_logger
+
+logger = get_logger("events")
+
+PENDING_REGISTRATIONS_TOPIC = "pending_registrations"
+
+WATCHED_COLLECTIONS = ["users", "pending_registrations"]
+
+# Fields of a users document that may reach an admin's dashboard
+USER_EVENT_FIELDS = (
+    "email", "first_name", "last_name", "role", "organization_id",
+    "is_active", "created_at", "updated_at", "created_by",
+)
+
+# Server error codes for "change streams need a replica set" and
+# "this server doesn't know fullDocumentBeforeChange" (pre-6.0)
+_NOT_A_REPLICA_SET = 40573
+_UNKNOWN_FIELD = 40415
+_HISTORY_LOST = 286
+
+
+def organization_topic(organization_id: str) -> str:
+    return f"organization:{organization_id}"
+
+def _topic_for(collection: str, doc: Optional[dict]) -> Optional[str]:
+    if collection == "pending_registrations":
+        return PENDING_REGISTRATIONS_TOPIC
+    organization_id = (doc or {}).get("organization_id")
+    return organization_topic(organization_id) if organization_id else None
+
+def _plain(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    return value
+
+def _public_document(collection: str, doc: Optional[dict]) -> Optional[dict]:
+    if doc is None:
+        return None
+    if collection == "users":
+        public = {field: doc[field] for field in USER_EVENT_FIELDS if field in doc}
+    else:
+        public = dict(doc)
+        public["user_data"] = {
+            key: value for key, value in (doc.get("user_data") or {}).items() if key != "password"
+        }
+    public["_id"] = doc["_id"]
+    return _plain(public)
+
+def format_sse(event: dict) -> bytes:
+    return f"event: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n".encode()
+
+
+class Subscription:
+    def __init__(self, topic: str, maxsize: int):
+        self.topic = topic
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+
+class EventBroker:
+    """Fans each published event out to every subscriber of its topic.
+
+    Events are encoded once and the same bytes are queued for every
+    subscriber. A subscriber whose queue fills up is dropped and told to
+    resync, so one stalled client never holds up the rest.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self.published = 0
+        self.delivered = 0
+        self.dropped_subscribers = 0
+
+    def subscribe(self, topic: str) -> Subscription:
+        subscription = Subscription(topic, settings.SSE_QUEUE_SIZE)
+        self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.topic)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.topic]
+
+    def publish(self, topic: str, event: dict):
+        self.published += 1
+        subscribers = self._subscribers.get(topic)
+        if not subscribers:
+            return
+        message = format_sse(event)
+        for subscription in list(subscribers):
+            try:
+                subscription.queue.put_nowait(message)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                subscription.overflowed = True
+                self.dropped_subscribers += 1
+                self.unsubscribe(subscription)
+
+    def metrics(self) -> dict:
+        return {
+            "topics": len(self._subscribers),
+            "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped_subscribers": self.dropped_subscribers,
+        }
+
+
+class ChangeFeed:
+    """Publishes change stream events to the broker, resuming after errors.
+
+    ``mode`` is ``change_stream`` once the stream is open and ``local`` when
+    change streams are disabled or unsupported by the server.
+    """
+
+    def __init__(self, broker: EventBroker):
+        self.broker = broker
+        self.mode = "starting"
+        self.errors = 0
+        self._task = None
+        self._resume_token = None
+        self._pre_images = True
+
+    async def start(self):
+        if not settings.CHANGE_STREAMS_ENABLED:
+            self.mode = "local"
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _pipeline(self) -> list:
+        hidden = {}
+        for image in ("fullDocument", "fullDocumentBeforeChange"):
+            hidden[f"{image}.password_hash"] = 0
+            hidden[f"{image}.user_data.password"] = 0
+        hidden["updateDescription"] = 0
+        return [
+            {"$match": {
+                "ns.coll": {"$in": WATCHED_COLLECTIONS},
+                "operationType": {"$in": ["insert", "update", "replace", "delete"]},
+            }},
+            {"$project": hidden},
+        ]
+
+    async def _enable_pre_images(self):
+        # Deleted users carry no organization_id unless the server keeps pre-images (6.0+)
+        try:
+            await database.db.command("collMod", "users", changeStreamPreAndPostImages={"enabled": True})
+        except PyMongoError as e:
+            logger.info("Change stream pre-images unavailable for users: %s", e)
+
+    async def _run(self):
+        await self._enable_pre_images()
+        backoff = 1
+        while True:
+            options = {"full_document": "updateLookup", "resume_after": self._resume_token}
+            if self._pre_images:
+                options["full_document_before_change"] = "whenAvailable"
+            try:
+                async with database.db.watch(self._pipeline(), **options) as stream:
+                    self.mode = "change_stream"
+                    backoff = 1
+                    async for change in stream:
+                        self._resume_token = stream.resume_token
+                        self._dispatch(change)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code == _NOT_A_REPLICA_SET:
+                    logger.warning("Change streams need a replica set; publishing events in-process")
+                    self.mode = "local"
+                    return
+                if e.code == _UNKNOWN_FIELD and self._pre_images:
+                    self._pre_images = False
+                    continue
+                if e.code == _HISTORY_LOST:
+                    self._resume_token = None
+                self.errors += 1
+                logger.error("Change stream error: %s", e)
+            except PyMongoError as e:
+                self.errors += 1
+                logger.error("Change stream error: %s", e)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _dispatch(self, change: dict):
+        collection = change["ns"]["coll"]
+        operation = "update" if change["operationType"] == "replace" else change["operationType"]
+        document = change.get("fullDocument")
+        topic = _topic_for(collection, document or change.get("fullDocumentBeforeChange"))
+        if topic is None:
+            return
+        self.broker.publish(topic, {
+            "type": operation,
+            "collection": collection,
+            "id": str(change["documentKey"]["_id"]),
+            "document": _public_document(collection, document) if operation != "delete" else None,
+        })
+
+
+event_broker = EventBroker()
+change_feed = ChangeFeed(event_broker)
+
+
+def local_change(collection: str, operation: str, doc: dict):
+    """Publish a write made by this process when no change stream is feeding the broker"""
+    if change_feed.mode != "local":
+        return
+    topic = _topic_for(collection, doc)
+    if topic is None:
+        return
+    event_broker.publish(topic, {
+        "type": operation,
+        "collection": collection,
+        "id": str(doc["_id"]),
+        "document": _public_document(collection, doc) if operation != "delete" else None,
+    })
+
+
+async def sse_stream(topic: str) -> AsyncIterator[bytes]:
+    # Subscribing inside the generator ties the subscription to the stream's lifetime
+    subscription = event_broker.subscribe(topic)
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            if subscription.overflowed and subscription.queue.empty():
+                # Events were lost; the client should refetch before listening again
+                yield format_sse({"type": "resync"})
+                return
+            try:
+                yield await asyncio.wait_for(subscription.queue.get(), timeout=settings.SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+    finally:
+        event_broker.unsubscribe(subscription)
+
+def event_stream_response(topic: str) -> StreamingResponse:
+    return StreamingResponse(
+        sse_stream(topic),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
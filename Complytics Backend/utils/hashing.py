@@ -0,0 +1,210 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from config import settings
+from utils.log import get_logger
+from utils.metrics import record_phase
+
+pwd_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=12, deprecated="auto")
+logger = get_logger("hashing")
+
+
+# Worker entry points must live at module level so a process pool can pickle them
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+def _verify_and_update(plain_password: str, hashed_password: str):
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def apply_bcrypt_rounds(rounds: int):
+    """Pin the bcrypt cost so hashes at any other cost report needs_update"""
+    pwd_context.update(
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds
+    )
+
+def measure_bcrypt_ms(rounds: int, samples: int = 3) -> float:
+    """Median wall time of one bcrypt hash at the given cost, in milliseconds"""
+    handler = pwd_context.handler("bcrypt").using(rounds=rounds)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        handler.hash("calibration-password")
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def calibrate_bcrypt_rounds(target_ms: float, min_rounds: int, max_rounds: int):
+    """Pick the highest cost whose hash time stays within ``target_ms``.
+
+    Each extra round doubles the work, so one measurement at ``min_rounds``
+    predicts the rest; the prediction is then checked against a real run.
+    Returns ``(rounds, measured_ms)``.
+    """
+    base_ms = measure_bcrypt_ms(min_rounds)
+    rounds = min_rounds
+    while rounds < max_rounds and base_ms * 2 ** (rounds + 1 - min_rounds) <= target_ms:
+        rounds += 1
+
+    measured_ms = base_ms if rounds == min_rounds else measure_bcrypt_ms(rounds)
+    while rounds > min_rounds and measured_ms > target_ms:
+        rounds -= 1
+        measured_ms = measure_bcrypt_ms(rounds)
+    return rounds, measured_ms
+
+
+class PasswordHasher:
+    """Runs bcrypt in a worker pool so hashing never blocks the event loop.
+
+    At most ``max_workers + max_queue`` calls may be outstanding; anything
+    beyond that is refused with a 503 instead of piling up behind the pool.
+    A call that times out keeps its slot until bcrypt actually finishes in
+    the worker, so timeouts can't let the executor's own queue grow.
+    """
+
+    def __init__(self, executor: str, max_workers: int, max_queue: int, timeout: float):
+        self.executor_kind = executor
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = None
+        # Released from executor callbacks, which run on worker threads
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._peak_queue_depth = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._total_seconds = 0.0
+
+    def start(self):
+        if self._executor is not None:
+            return
+        if self.executor_kind == "process":
+            # Workers may not inherit our context, so pin the cost explicitly
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=apply_bcrypt_rounds,
+                initargs=(pwd_context.handler("bcrypt").default_rounds,)
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="password-hasher"
+            )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._pending - self.max_workers)
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server is busy, please retry shortly",
+                    headers={"Retry-After": "1"}
+                )
+            self._pending += 1
+            self._peak_queue_depth = max(self._peak_queue_depth, self.queue_depth)
+
+        self.start()
+        started = time.perf_counter()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        # The slot is freed when the job leaves the executor, not when we stop waiting
+        future.add_done_callback(self._release)
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Password hashing timed out, please retry",
+                headers={"Retry-After": "1"}
+            )
+        finally:
+            record_phase("bcrypt", time.perf_counter() - started)
+
+        self._completed += 1
+        self._total_seconds += time.perf_counter() - started
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(_verify, plain_password, hashed_password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str):
+        """Returns ``(valid, new_hash)``; new_hash is set when the stored cost is stale"""
+        return await self._run(_verify_and_update, plain_password, hashed_password)
+
+    def metrics(self) -> dict:
+        return {
+            "executor": self.executor_kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": min(self._pending, self.max_workers),
+            "queue_depth": self.queue_depth,
+            "peak_queue_depth": self._peak_queue_depth,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "timeouts": self._timeouts,
+            "avg_duration_ms": round(self._total_seconds / self._completed * 1000, 2) if self._completed else 0.0,
+        }
+
+
+password_hasher = PasswordHasher(
+    executor=settings.PASSWORD_HASH_EXECUTOR,
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    timeout=settings.PASSWORD_HASH_TIMEOUT_SECONDS
+)
+
+# Filled in by configure_password_hashing() and reported by /diagnostics/hashing
+calibration = {
+    "calibrated": False,
+    "target_ms": settings.PASSWORD_HASH_TARGET_MS,
+    "measured_ms": None,
+}
+
+def configure_password_hashing():
+    """Resolve the bcrypt cost (calibrating if unset) and start the worker pool"""
+    if settings.BCRYPT_ROUNDS is None:
+        rounds, measured_ms = calibrate_bcrypt_rounds(
+            settings.PASSWORD_HASH_TARGET_MS,
+            settings.BCRYPT_MIN_ROUNDS,
+            settings.BCRYPT_MAX_ROUNDS
+        )
+        settings.BCRYPT_ROUNDS = rounds
+        calibration.update(calibrated=True, measured_ms=round(measured_ms, 2))
+    else:
+        calibration["measured_ms"] = round(measure_bcrypt_ms(settings.BCRYPT_ROUNDS, samples=1), 2)
+
+    apply_bcrypt_rounds(settings.BCRYPT_ROUNDS)
+    password_hasher.start()
+    logger.info(
+        "Password hashing: bcrypt rounds=%s (~%s ms/hash)", settings.BCRYPT_ROUNDS, calibration["measured_ms"]
+    )
@@ -0,0 +1,165 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from pymongo.errors import OperationFailure
+from utils.pagination import KEYSET_SORT
+
+
+class IndexSpec:
+    """One desired index. ``name`` defaults to MongoDB's generated name."""
+
+    def __init__(
+        self,
+        keys: List[Tuple[str, int]],
+        name: Optional[str] = None,
+        unique: bool = False,
+        partial: Optional[dict] = None,
+        expire_after_seconds: Optional[int] = None
+    ):
+        self.keys = keys
+        self.name = name or "_".join(f"{field}_{direction}" for field, direction in keys)
+        self.unique = unique
+        self.partial = partial
+        self.expire_after_seconds = expire_after_seconds
+
+    def options(self) -> dict:
+        options = {"name": self.name}
+        if self.unique:
+            options["unique"] = True
+        if self.partial is not None:
+            options["partialFilterExpression"] = self.partial
+        if self.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = self.expire_after_seconds
+        return options
+
+    def differences(self, existing: dict) -> List[str]:
+        """Ways in which an existing index (from index_information) differs"""
+        diffs = []
+        if [(field, direction) for field, direction in existing["key"]] != self.keys:
+            diffs.append(f"keys {existing['key']} != {self.keys}")
+        if bool(existing.get("unique", False)) != self.unique:
+            diffs.append(f"unique {existing.get('unique', False)} != {self.unique}")
+        if existing.get("partialFilterExpression") != self.partial:
+            diffs.append(f"partial {existing.get('partialFilterExpression')} != {self.partial}")
+        if existing.get("expireAfterSeconds") != self.expire_after_seconds:
+            diffs.append(f"expireAfterSeconds {existing.get('expireAfterSeconds')} != {self.expire_after_seconds}")
+        return diffs
+
+
+# Desired indexes per collection. Every hot query filter should be covered here.
+INDEXES: Dict[str, List[IndexSpec]] = {
+    # List filters end in (created_at, _id) so keyset pages are index-ordered
+    "users": [
+        IndexSpec([("email", 1)], unique=True),
+        IndexSpec([("organization_id", 1), ("role", 1), ("created_at", -1), ("_id", -1)]),
+        IndexSpec([("is_active", 1), ("created_at", -1), ("_id", -1)], partial={"is_active": True}),
+        IndexSpec([("role", 1), ("created_at", -1), ("_id", -1)]),
+    ],
+    "pending_registrations": [
+        IndexSpec([("user_data.email", 1)], unique=True),
+        IndexSpec([("is_approved", 1), ("created_at", -1), ("_id", -1)]),
+    ],
+    "organizations": [
+        IndexSpec([("is_active", 1), ("created_at", -1), ("_id", -1)]),
+    ],
+    "rate_limits": [
+        IndexSpec([("expires_at", 1)], expire_after_seconds=0),
+    ],
+    "email_outbox": [
+        IndexSpec([("status", 1), ("next_attempt_at", 1)]),
+    ],
+}
+
+# Representative shapes of the queries the routes issue: (label, collection, filter, sort)
+QUERY_SHAPES = [
+    ("auth principal by email", "users", {"email": "someone@example.com"}, None),
+    ("team members of an organization", "users",
+     {"organization_id": "000000000000000000000000",
+      "role": {"$in": ["compliance_team", "it_team", "management_team"]}}, KEYSET_SORT),
+    ("admins", "users", {"role": "admin"}, KEYSET_SORT),
+    ("active users", "users", {"is_active": True}, KEYSET_SORT),
+    ("pending registration by email", "pending_registrations", {"user_data.email": "someone@example.com"}, None),
+    ("pending registrations", "pending_registrations", {"is_approved": False}, KEYSET_SORT),
+    ("active organizations", "organizations", {"is_active": True}, KEYSET_SORT),
+    ("due outbox messages", "email_outbox",
+     {"status": {"$in": ["pending", "sending"]}, "next_attempt_at": {"$lte": datetime(2000, 1, 1)}}, [("next_attempt_at", 1)]),
+]
+
+
+async def reconcile_indexes(db, rebuild_drifted: bool = False) -> dict:
+    """Create missing indexes and report drift against INDEXES.
+
+    Drifted indexes (same name, different definition) are only dropped and
+    rebuilt when ``rebuild_drifted`` is set; indexes not in the spec are
+    reported but never dropped.
+    """
+    report = {"created": [], "unchanged": [], "drifted": [], "rebuilt": [], "extraneous": [], "errors": []}
+
+    for collection_name, specs in INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        wanted = {spec.name for spec in specs}
+
+        for spec in specs:
+            label = f"{collection_name}.{spec.name}"
+            try:
+                if spec.name not in existing:
+                    await collection.create_index(spec.keys, **spec.options())
+                    report["created"].append(label)
+                    continue
+
+                diffs = spec.differences(existing[spec.name])
+                if not diffs:
+                    report["unchanged"].append(label)
+                elif rebuild_drifted:
+                    await collection.drop_index(spec.name)
+                    await collection.create_index(spec.keys, **spec.options())
+                    report["rebuilt"].append(label)
+                else:
+                    report["drifted"].append(f"{label}: {'; '.join(diffs)}")
+            except OperationFailure as e:
+                # e.g. duplicate data blocking a unique index; keep starting up
+                report["errors"].append(f"{label}: {e.details.get('errmsg', str(e)) if e.details else str(e)}")
+
+        for name in existing:
+            if name != "_id_" and name not in wanted:
+                report["extraneous"].append(f"{collection_name}.{name}")
+
+    return report
+
+
+def _plan_stages(plan: dict):
+    yield plan.get("stage")
+    for child_key in ("inputStage", "queryPlan"):
+        if child_key in plan:
+            yield from _plan_stages(plan[child_key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+def winning_plan_stages(explanation: dict) -> List[str]:
+    """Stage names of the winning plan(s) in an explain() result, aggregations included"""
+    planners = []
+    if "queryPlanner" in explanation:
+        planners.append(explanation["queryPlanner"])
+    for stage in explanation.get("stages", []):
+        if "$cursor" in stage:
+            planners.append(stage["$cursor"]["queryPlanner"])
+    return [stage for planner in planners for stage in _plan_stages(planner["winningPlan"]) if stage]
+
+
+async def explain_query_shapes(db) -> List[dict]:
+    """Run explain() on every QUERY_SHAPES entry and report its winning plan stages"""
+    results = []
+    for label, collection_name, query_filter, sort in QUERY_SHAPES:
+        command = {"find": collection_name, "filter": query_filter}
+        if sort:
+            command["sort"] = dict(sort)
+        explanation = await db.command("explain", command, verbosity="queryPlanner")
+        stages = winning_plan_stages(explanation)
+        results.append({
+            "query": label,
+            "collection": collection_name,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return results
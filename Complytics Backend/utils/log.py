@@ -0,0 +1,173 @@
+"""Structured, queued logging with request-id correlation.
+
+Handlers never run on the request path: records are put on a bounded queue
+by a ``QueueHandler`` and written to stdout by a ``QueueListener`` thread.
+When the queue is full, records are dropped and counted rather than
+blocking the event loop.
+
+Loggers come from ``get_logger`` and use lazy ``%`` arguments, so a disabled
+level costs one ``isEnabledFor`` check. Anything more expensive, such as
+extra queries or dumping documents, belongs behind
+``logger.isEnabledFor(logging.DEBUG)``. Structured fields go in ``extra=``
+and are emitted as JSON keys.
+
+DEBUG records are sampled per request (``LOG_DEBUG_SAMPLE_RATE``), so a
+sampled request keeps all of its debug lines and the others keep none.
+"""
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import uuid
+import zlib
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+from config import settings
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_exception_formatter = logging.Formatter()
+
+# Attributes every LogRecord has; anything else came from ``extra=``
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"complytics.{name}")
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp the current request id and sample DEBUG records per request"""
+
+    def __init__(self, debug_sample_rate: float):
+        super().__init__()
+        self.threshold = int(max(0.0, min(1.0, debug_sample_rate)) * 10000)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        if record.levelno >= logging.INFO or self.threshold >= 10000:
+            return True
+        if record.request_id is None:
+            return self.threshold > 0
+        return zlib.crc32(record.request_id.encode()) % 10000 < self.threshold
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.request_id:
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and key != "request_id":
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of raising when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Unlike the stdlib version, keep the traceback out of ``msg`` so the
+        # JSON output has it as its own field
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogSystem:
+    def __init__(self):
+        self.handler: Optional[DroppingQueueHandler] = None
+        self.listener: Optional[logging.handlers.QueueListener] = None
+
+    def configure(self):
+        """Route the ``complytics`` loggers through the queue; safe to call twice"""
+        if self.handler is not None:
+            return
+        output = logging.StreamHandler(sys.stdout)
+        if settings.LOG_FORMAT == "json":
+            output.setFormatter(JSONFormatter())
+        else:
+            output.setFormatter(logging.Formatter(
+                "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+            ))
+
+        self.handler = DroppingQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+        self.handler.addFilter(RequestContextFilter(settings.LOG_DEBUG_SAMPLE_RATE))
+        self.listener = logging.handlers.QueueListener(self.handler.queue, output)
+        self.listener.start()
+
+        root = logging.getLogger("complytics")
+        root.setLevel(settings.LOG_LEVEL.upper())
+        root.addHandler(self.handler)
+        root.propagate = False
+
+    def shutdown(self):
+        """Flush queued records and stop the writer thread"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def metrics(self) -> dict:
+        return {
+            "level": logging.getLevelName(logging.getLogger("complytics").getEffectiveLevel()),
+            "queued": self.handler.queue.qsize() if self.handler else 0,
+            "dropped": self.handler.dropped if self.handler else 0,
+        }
+
+
+log_system = LogSystem()
+
+
+class RequestIdMiddleware:
+    """Bind ``X-Request-ID`` (or a fresh one) to the request's context and echo it back"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
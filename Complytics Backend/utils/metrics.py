@@ -0,0 +1,245 @@
+"""Request latency, Mongo command accounting and timed phases, in Prometheus text format.
+
+``MetricsMiddleware`` times every HTTP request under its route template
+(``/admin/team-members/{member_id}``, never the raw path) and binds a
+``RequestStats`` to a contextvar for the request's lifetime. Motor copies
+the caller's context into its executor threads, so ``CommandMetricsListener``
+sees that contextvar when pymongo reports a command, and charges the
+command's count, duration and bytes to the route that issued it. Code that
+does slow non-Mongo work reports it with ``record_phase`` (bcrypt in
+utils/hashing.py, SMTP in utils/email_outbox.py).
+
+Aggregates are plain counters behind a lock; the text is only rendered
+when ``/metrics`` is scraped.
+"""
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Optional
+import bson
+from bson.raw_bson import RawBSONDocument
+from pymongo import monitoring
+from config import settings
+from utils.pool_metrics import pool_metrics
+
+# Seconds; one histogram layout serves requests and phases
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestStats:
+    __slots__ = ("commands", "mongo_seconds", "bytes_sent", "bytes_received", "phases")
+
+    def __init__(self):
+        self.commands = 0
+        self.mongo_seconds = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.phases = {}
+
+
+request_stats_var: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels) -> str:
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_latency = defaultdict(Histogram)      # (method, route)
+        self.requests = defaultdict(int)                   # (method, route, status)
+        self.route_mongo_commands = defaultdict(int)       # route
+        self.route_mongo_seconds = defaultdict(float)      # route
+        self.route_mongo_bytes = defaultdict(int)          # (route, direction)
+        self.route_phase_seconds = defaultdict(float)      # (route, phase)
+        self.mongo_commands = defaultdict(int)             # (command, outcome)
+        self.mongo_command_seconds = defaultdict(float)    # command
+        self.phase_latency = defaultdict(Histogram)        # phase
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        with self._lock:
+            self.request_latency[(method, route)].observe(seconds)
+            self.requests[(method, route, status)] += 1
+            if stats.commands:
+                self.route_mongo_commands[route] += stats.commands
+                self.route_mongo_seconds[route] += stats.mongo_seconds
+                self.route_mongo_bytes[(route, "sent")] += stats.bytes_sent
+                self.route_mongo_bytes[(route, "received")] += stats.bytes_received
+            for phase, phase_seconds in stats.phases.items():
+                self.route_phase_seconds[(route, phase)] += phase_seconds
+
+    def observe_command(self, command: str, outcome: str, seconds: float):
+        with self._lock:
+            self.mongo_commands[(command, outcome)] += 1
+            self.mongo_command_seconds[command] += seconds
+
+    def observe_phase(self, phase: str, seconds: float):
+        with self._lock:
+            self.phase_latency[phase].observe(seconds)
+
+    def render(self) -> str:
+        """Prometheus text exposition format, version 0.0.4"""
+        from utils.hashing import password_hasher  # imports this module
+
+        lines = []
+
+        def histogram(name: str, help_text: str, series: dict, label_names: tuple):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, hist in series.items():
+                labels = _labels(**dict(zip(label_names, key if isinstance(key, tuple) else (key,))))
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, hist.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {hist.count}')
+                lines.append(f"{name}_sum{{{labels}}} {hist.total}")
+                lines.append(f"{name}_count{{{labels}}} {hist.count}")
+
+        def simple(name: str, kind: str, help_text: str, series: dict, label_names: tuple):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in series.items():
+                labels = _labels(**dict(zip(label_names, key if isinstance(key, tuple) else (key,))))
+                lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+
+        with self._lock:
+            histogram("complytics_http_request_duration_seconds", "HTTP request latency by route template.",
+                      self.request_latency, ("method", "route"))
+            simple("complytics_http_requests_total", "counter", "HTTP requests by route template and status.",
+                   self.requests, ("method", "route", "status"))
+            simple("complytics_route_mongo_commands_total", "counter", "Mongo commands issued while serving a route.",
+                   self.route_mongo_commands, ("route",))
+            simple("complytics_route_mongo_seconds_total", "counter", "Mongo command time spent serving a route.",
+                   self.route_mongo_seconds, ("route",))
+            simple("complytics_route_mongo_bytes_total", "counter", "BSON bytes exchanged with Mongo while serving a route.",
+                   self.route_mongo_bytes, ("route", "direction"))
+            simple("complytics_route_phase_seconds_total", "counter", "Time in bcrypt/SMTP phases while serving a route.",
+                   self.route_phase_seconds, ("route", "phase"))
+            simple("complytics_mongo_commands_total", "counter", "Mongo commands by name and outcome.",
+                   self.mongo_commands, ("command", "outcome"))
+            simple("complytics_mongo_command_seconds_total", "counter", "Mongo command time by name.",
+                   self.mongo_command_seconds, ("command",))
+            histogram("complytics_phase_duration_seconds", "bcrypt and SMTP phase latency.",
+                      self.phase_latency, ("phase",))
+
+        pool = pool_metrics.snapshot()
+        hashing = password_hasher.metrics()
+        simple("complytics_mongo_pool_connections_open", "gauge", "Open Mongo connections.",
+               {(): pool["connections_open"]}, ())
+        simple("complytics_mongo_pool_in_use", "gauge", "Mongo connections checked out.", {(): pool["in_use"]}, ())
+        simple("complytics_bcrypt_queue_depth", "gauge", "Hashes waiting for a worker.",
+               {(): hashing["queue_depth"]}, ())
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+
+def record_phase(phase: str, seconds: float):
+    """Charge ``seconds`` of ``phase`` to the current request (if any) and the phase histogram"""
+    stats = request_stats_var.get()
+    if stats is not None:
+        stats.phases[phase] = stats.phases.get(phase, 0.0) + seconds
+    metrics_registry.observe_phase(phase, seconds)
+
+
+def _bson_size(doc) -> int:
+    if isinstance(doc, RawBSONDocument):
+        return len(doc.raw)
+    return len(bson.encode(doc))
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Counts Mongo commands globally and against the request that issued them.
+
+    Called on Motor's executor threads, in the issuing request's context;
+    one request's commands can run on several threads at once, so their
+    RequestStats updates take a lock. Byte counts re-encode the command and
+    reply, so they can be switched off with METRICS_MONGO_BYTES.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        stats = request_stats_var.get()
+        if stats is not None and settings.METRICS_MONGO_BYTES:
+            size = _bson_size(event.command)
+            with self._lock:
+                stats.bytes_sent += size
+
+    def succeeded(self, event):
+        self._finish(event, "success", settings.METRICS_MONGO_BYTES and _bson_size(event.reply))
+
+    def failed(self, event):
+        self._finish(event, "failure", 0)
+
+    def _finish(self, event, outcome: str, reply_bytes: int):
+        seconds = event.duration_micros / 1e6
+        stats = request_stats_var.get()
+        if stats is not None:
+            with self._lock:
+                stats.commands += 1
+                stats.mongo_seconds += seconds
+                stats.bytes_received += reply_bytes or 0
+        metrics_registry.observe_command(event.command_name, outcome, seconds)
+
+
+command_metrics = CommandMetricsListener()
+
+
+class MetricsMiddleware:
+    """Time each HTTP request under its route template and collect its RequestStats"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = request_stats_var.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_stats_var.reset(token)
+            route = scope.get("route")
+            metrics_registry.observe_request(
+                scope["method"],
+                # Unmatched paths share one label so scanners can't blow up the series count
+                getattr(route, "path_format", None) or "unmatched",
+                status_code,
+                time.perf_counter() - started,
+                stats
+            )
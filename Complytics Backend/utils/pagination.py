@@ -0,0 +1,88 @@
+import asyncio
+import base64
+import json
+from datetime import datetime
+from typing import Generic, List, Optional, TypeVar
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel
+from config import settings
+
+T = TypeVar("T")
+
+# Newest first; every paginated collection has an index ending in these keys
+KEYSET_SORT = [("created_at", -1), ("_id", -1)]
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
+class PageParams:
+    def __init__(self, limit: Optional[int], cursor: Optional[str], include_total: bool):
+        # Clients that ask for neither a limit nor a cursor get the old bare list
+        self.legacy = settings.LEGACY_UNPAGINATED_LISTS and limit is None and cursor is None
+        self.limit = limit or settings.PAGINATION_DEFAULT_LIMIT
+        self.cursor = cursor
+        self.include_total = include_total
+
+
+def page_params(
+    limit: Optional[int] = Query(None, ge=1, le=settings.PAGINATION_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    include_total: bool = False
+) -> PageParams:
+    return PageParams(limit, cursor, include_total)
+
+
+def encode_cursor(doc: dict) -> str:
+    created_at = doc.get("created_at")
+    payload = {"t": created_at.isoformat() if created_at else None, "id": str(doc["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(token: str):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        created_at = datetime.fromisoformat(payload["t"]) if payload["t"] else None
+        return created_at, ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+def keyset_filter(base_filter: dict, cursor: Optional[str]) -> dict:
+    """Restrict ``base_filter`` to documents after ``cursor`` in KEYSET_SORT order"""
+    if not cursor:
+        return base_filter
+    created_at, last_id = decode_cursor(cursor)
+    if created_at is None:
+        # Missing created_at sorts last; only smaller ids remain among those
+        after = {"created_at": None, "_id": {"$lt": last_id}}
+    else:
+        after = {"$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}},
+            {"created_at": None},
+        ]}
+    return {"$and": [base_filter, after]}
+
+
+async def paginate(collection, base_filter: dict, projection: dict, page: PageParams):
+    """Fetch one page; returns ``(docs, next_cursor, total)``"""
+    cursor = collection.find(keyset_filter(base_filter, page.cursor), projection).sort(KEYSET_SORT)
+    fetch = cursor.limit(page.limit + 1).to_list(page.limit + 1)
+    if page.include_total:
+        docs, total = await asyncio.gather(fetch, collection.count_documents(base_filter))
+    else:
+        docs, total = await fetch, None
+
+    next_cursor = None
+    if len(docs) > page.limit:
+        docs = docs[:page.limit]
+        next_cursor = encode_cursor(docs[-1])
+    return docs, next_cursor, total
@@ -0,0 +1,50 @@
+"""Field projections per use case, so queries only ship what the handler reads.
+
+Anything that ends up in a response or a principal must never include
+``password_hash``; only CREDENTIAL_CHECK asks for it.
+"""
+
+# Fields backing UserInDB (plus token_version, which it keeps but never emits)
+USER_PRINCIPAL = {
+    "email": 1,
+    "first_name": 1,
+    "last_name": 1,
+    "role": 1,
+    "organization_id": 1,
+    "is_active": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "created_by": 1,
+    "token_version": 1,
+}
+
+# Rows of /admin/team-members, /superadmin/admins and /superadmin/active-users
+USER_LISTING_ROW = USER_PRINCIPAL
+
+# Login and password change: the principal plus the stored hash
+CREDENTIAL_CHECK = {**USER_PRINCIPAL, "password_hash": 1}
+
+# Fields needed to address a notification email to a user
+USER_CONTACT = {"email": 1, "first_name": 1, "last_name": 1, "role": 1, "is_active": 1}
+
+# Pure existence checks
+ID_ONLY = {"_id": 1}
+
+TOKEN_VERSION = {"token_version": 1}
+
+# Buckets a member is counted in by org_stats
+MEMBERSHIP = {"role": 1, "is_active": 1}
+
+ORGANIZATION_LISTING_ROW = {
+    "name": 1,
+    "domain": 1,
+    "is_active": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "created_by": 1,
+}
+
+ORGANIZATION_NAME = {"name": 1}
+
+# Pending registrations as shown to superadmins: everything but the registrant's password
+PENDING_REGISTRATION_ROW = {"user_data.password": 0}
@@ -0,0 +1,113 @@
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from fastapi import HTTPException, Request, status
+from pymongo import ReturnDocument
+from config import settings
+from db import database
+
+
+class MemoryRateLimitStorage:
+    """Per-key token buckets held in process memory; O(1) per hit.
+
+    The bucket map is LRU-bounded so a flood of distinct keys cannot grow it
+    without limit. Counts are per worker process.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    async def hit(self, key: str, limit: int, window_seconds: int) -> float:
+        now = time.monotonic()
+        refill_rate = limit / window_seconds
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(limit), now]
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            tokens, updated = bucket
+            bucket[0] = min(float(limit), tokens + (now - updated) * refill_rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / refill_rate
+
+
+class MongoRateLimitStorage:
+    """Fixed-window counters in the ``rate_limits`` collection.
+
+    Shared by every worker; documents expire through the TTL index on
+    ``expires_at`` declared in utils/indexes.py.
+    """
+
+    async def hit(self, key: str, limit: int, window_seconds: int) -> float:
+        now = time.time()
+        window_start = int(now // window_seconds) * window_seconds
+        window_end = window_start + window_seconds
+        doc = await database.db.rate_limits.find_one_and_update(
+            {"_id": f"{key}:{window_start}"},
+            {
+                "$inc": {"count": 1},
+                "$setOnInsert": {"expires_at": datetime.utcfromtimestamp(window_end) + timedelta(seconds=60)}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if doc["count"] <= limit:
+            return 0.0
+        return window_end - now
+
+
+class RateLimiter:
+    def __init__(self, storage):
+        self.storage = storage
+        self.rejected = 0
+
+    async def check(self, scope: str, request: Request, email: str, ip_limit: int, email_limit: int, window_seconds: int):
+        """Raise 429 if either the client IP or the target email is over its limit"""
+        client_ip = request.client.host if request.client else "unknown"
+        checks = (
+            (f"{scope}:ip:{client_ip}", ip_limit),
+            (f"{scope}:email:{email.strip().lower()}", email_limit),
+        )
+        for key, limit in checks:
+            retry_after = await self.storage.hit(key, limit, window_seconds)
+            if retry_after > 0:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many attempts, please try again later",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+                )
+
+    async def check_login(self, request: Request, email: str):
+        await self.check(
+            "login", request, email,
+            settings.LOGIN_RATE_LIMIT_PER_IP,
+            settings.LOGIN_RATE_LIMIT_PER_EMAIL,
+            settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS
+        )
+
+    async def check_forgot_password(self, request: Request, email: str):
+        await self.check(
+            "forgot-password", request, email,
+            settings.FORGOT_PASSWORD_RATE_LIMIT_PER_IP,
+            settings.FORGOT_PASSWORD_RATE_LIMIT_PER_EMAIL,
+            settings.FORGOT_PASSWORD_RATE_LIMIT_WINDOW_SECONDS
+        )
+
+
+def _build_storage():
+    if settings.RATE_LIMIT_BACKEND == "mongo":
+        return MongoRateLimitStorage()
+    return MemoryRateLimitStorage(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+
+
+rate_limiter = RateLimiter(_build_storage())
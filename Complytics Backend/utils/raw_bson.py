@@ -0,0 +1,35 @@
+"""Raw BSON reads for result sets that are materialized in full.
+
+With ``RawBSONDocument`` as the document class, Motor hands back each batch
+as undecoded bytes instead of building a dict per document up front. Rows
+are then decoded one at a time, right before they're rendered, and the dict
+is dropped as soon as the row is emitted.
+
+``RawBSONDocument`` inflates (and keeps) the whole document on first key
+access, so rows go through ``inflate`` rather than being indexed directly;
+decoding is limited to the emitted fields by the projection on the query.
+
+This pays off where the whole result is held at once (the list routes);
+streamed exports only ever hold one batch, and re-parsing each raw row
+costs more CPU than it saves there (benchmarks/raw_bson_reads.py).
+"""
+from typing import Mapping
+import bson
+from bson.codec_options import DEFAULT_CODEC_OPTIONS
+from bson.raw_bson import RawBSONDocument
+from config import settings
+
+
+def raw_reads(collection):
+    """``collection`` returning RawBSONDocuments, if MONGODB_RAW_BSON_READS is on"""
+    if not settings.MONGODB_RAW_BSON_READS:
+        return collection
+    return collection.with_options(
+        codec_options=collection.codec_options.with_options(document_class=RawBSONDocument)
+    )
+
+def inflate(doc: Mapping) -> dict:
+    """Decode a raw row into a fresh dict without caching it on the document"""
+    if isinstance(doc, RawBSONDocument):
+        return bson.decode(doc.raw, DEFAULT_CODEC_OPTIONS)
+    return doc
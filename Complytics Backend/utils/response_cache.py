@@ -0,0 +1,90 @@
+from collections import OrderedDict
+from typing import Hashable, Iterable, Optional
+from fastapi import Request, Response
+from config import settings
+from utils.responses import FastJSONResponse, render_json
+
+
+class ResponseCache:
+    """In-process LRU of pre-serialized JSON bodies, bounded by total bytes.
+
+    Entries are keyed by route, query string and tenant, and remember the
+    ETag (see utils/etags.py) they were rendered under. A lookup only hits
+    when the current ETag matches, so entries never outlive a write, even
+    one made by another worker; local writes also drop their scopes' entries
+    right away to free the memory.
+    """
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.bytes_saved = 0
+
+    @staticmethod
+    def key(request: Request, tenant: Optional[str]) -> tuple:
+        return (request.url.path, tuple(sorted(request.query_params.multi_items())), tenant)
+
+    def _drop(self, key: Hashable):
+        _, body, _ = self._data.pop(key)
+        self._bytes -= len(body)
+
+    def serve(self, key: Hashable, etag: str, headers: dict) -> Optional[Response]:
+        entry = self._data.get(key)
+        if entry is None or entry[0] != etag:
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        self.bytes_saved += len(entry[1])
+        return FastJSONResponse(entry[1], headers=headers)
+
+    def store(self, key: Hashable, etag: str, scopes: Iterable[str], content, headers: dict) -> Response:
+        """Render ``content`` (see utils/responses.py), cache the bytes and return them"""
+        body = render_json(content)
+        if len(body) <= self.max_entry_bytes:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (etag, body, frozenset(scopes))
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+        return FastJSONResponse(body, headers=headers)
+
+    def invalidate(self, scopes: Iterable[str]) -> int:
+        """Drop every entry rendered from any of ``scopes``"""
+        scopes = set(scopes)
+        stale = [key for key, (_, _, entry_scopes) in self._data.items() if entry_scopes & scopes]
+        for key in stale:
+            self._drop(key)
+        self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        self._data.clear()
+        self._bytes = 0
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_BYTES, settings.RESPONSE_CACHE_MAX_ENTRY_BYTES)
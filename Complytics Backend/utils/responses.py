@@ -0,0 +1,32 @@
+"""orjson rendering for list responses built with ``from_mongo_trusted``.
+
+Routes that return these skip FastAPI's validate-then-jsonable_encoder pass
+over ``response_model``: models are flattened by their compiled serializer
+(aliases and ``exclude`` fields honoured) and orjson encodes the rest,
+datetimes included, in the same format FastAPI would emit.
+"""
+import orjson
+from bson import ObjectId
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+
+def _default(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump(by_alias=True)
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def render_json(content) -> bytes:
+    return orjson.dumps(content, default=_default)
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        # Bodies from the response cache arrive already rendered
+        if isinstance(content, bytes):
+            return content
+        return render_json(content)
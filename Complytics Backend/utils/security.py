@@ -1,23 +1,42 @@
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from config import settings
 from db import database
-from schemas.users import UserInDB
+from schemas.users import UserInDB, TokenClaims
+from utils.hashing import pwd_context, password_hasher
+from utils.cache import TTLCache
+from utils import projections
+from utils.email_outbox import enqueue_email, enqueue_emails
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import random
 import string
-from typing import Optional
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import ssl
+from typing import List, Optional
+import hashlib
+import time
+from bson import ObjectId
 
 security = HTTPBearer(auto_error=False)
 
-pwd_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=12, deprecated="auto")
+# Principals keyed by token subject (email); write paths must invalidate
+principal_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+# Token versions keyed by user id; None marks a deleted user
+token_version_cache = TTLCache(
+    maxsize=settings.TOKEN_VERSION_CACHE_SIZE,
+    ttl=settings.TOKEN_VERSION_CACHE_TTL_SECONDS
+)
+_MISSING = object()
+
+# Verified JWT payloads keyed by token digest, each kept until its own exp
+verified_token_cache = TTLCache(
+    maxsize=settings.TOKEN_CACHE_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL_SECONDS
+)
 
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="auth/login",
@@ -31,6 +50,12 @@ def verify_password(plain_password: str, hashed_password: str):
 def get_password_hash(password: str):
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str):
+    return await password_hasher.verify(plain_password, hashed_password)
+
+async def get_password_hash_async(password: str):
+    return await password_hasher.hash(password)
+
 SUPERADMIN_CREDENTIALS = {
     "email": "superadmin@complytics.com",
     "password_hash": get_password_hash("Admin@123"),  # Hashed version
@@ -53,23 +78,63 @@ async def authenticate_user(email: str, password: str):
         )
     
     # 2. Check database users
-    user = await database.db.users.find_one({"email": email})
+    user = await database.db.users.find_one({"email": email}, projections.CREDENTIAL_CHECK)
     if not user:
         return None
     
     # Verify password (assuming you have password hashing)
-    if not verify_password(password, user["password_hash"]):
+    valid, new_hash = await password_hasher.verify_and_update(password, user["password_hash"])
+    if not valid:
         return None
+
+    # Stored hash uses a different cost than the calibrated one; upgrade it now
+    if new_hash:
+        await database.db.users.update_one(
+            {"_id": user["_id"]},
+            {"$set": {"password_hash": new_hash}}
+        )
     
     return UserInDB.from_mongo(user)
 
+TOKEN_CLAIMS_VERSION = 1
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def build_token_claims(user: UserInDB) -> dict:
+    """Compact claim set carried by access tokens (see get_current_claims)"""
+    return {
+        "sub": user.email,
+        "uid": user.id,
+        "org": user.organization_id,
+        "role": user.role,
+        "ver": user.token_version,
+        "cv": TOKEN_CLAIMS_VERSION,
+    }
+
+def decode_access_token(token: str) -> dict:
+    """Verify and decode a JWT, memoizing the payload until the token expires.
+
+    Raises JWTError for invalid tokens; failures are never cached.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = verified_token_cache.get(key)
+    if payload is not None:
+        if payload.get("exp", float("inf")) > time.time():
+            return payload
+        verified_token_cache.pop(key)
+
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    expires_at = payload.get("exp")
+    ttl = None if expires_at is None else expires_at - time.time()
+    if ttl is None or ttl > 0:
+        verified_token_cache.set(key, payload, ttl=ttl)
+    return payload
+
+def _decode_token(credentials: Optional[HTTPAuthorizationCredentials]) -> dict:
     if credentials is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -77,46 +142,133 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    token = credentials.credentials
-    
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials",
-            )
+        payload = decode_access_token(credentials.credentials)
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+        )
+
+    if payload.get("sub") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+        )
+    return payload
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    payload = _decode_token(credentials)
+    email: str = payload["sub"]
+    
+    # First check if it's the superadmin
+    if email == "superadmin@complytics.com":
+        return UserInDB(
+            _id="superadmin_unique_id",
+            email=email,
+            first_name="Super",
+            last_name="Admin",
+            role="superadmin",
+            is_active=True,
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow()
+        )
         
-        # First check if it's the superadmin
-        if email == "superadmin@complytics.com":
-            return UserInDB(
-                _id="superadmin_unique_id",
-                email=email,
-                first_name="Super",
-                last_name="Admin",
-                role="superadmin",
-                is_active=True,
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow()
-            )
-            
+    principal = principal_cache.get(email)
+    if principal is None:
         # Then check database users
-        user = await database.db.users.find_one({"email": email})
+        user = await database.db.users.find_one({"email": email}, projections.USER_PRINCIPAL)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found"
             )
-        
-        return UserInDB.from_mongo(user)
-        
-    except JWTError:
+
+        principal = UserInDB.from_mongo(user)
+        principal_cache.set(email, principal)
+        # The document was just read, so the version check below needs no query
+        token_version_cache.set(principal.id, principal.token_version)
+
+    await _require_token_version(principal.id, payload.get("ver", 0))
+    return principal
+
+async def get_token_version(user_id: str) -> Optional[int]:
+    """Current token version for a user, or None if the user no longer exists"""
+    version = token_version_cache.get(user_id, _MISSING)
+    if version is not _MISSING:
+        return version
+
+    try:
+        obj_id = ObjectId(user_id)
+    except Exception:
+        return None
+    user = await database.db.users.find_one({"_id": obj_id}, projections.TOKEN_VERSION)
+    version = user.get("token_version", 0) if user else None
+    token_version_cache.set(user_id, version)
+    return version
+
+async def _require_token_version(user_id: str, token_version: int):
+    """Reject a token whose version was bumped by revoke_tokens"""
+    current_version = await get_token_version(user_id)
+    if current_version is None or current_version != token_version:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
         )
-        
+
+async def get_current_claims(credentials: HTTPAuthorizationCredentials = Depends(security)) -> TokenClaims:
+    """Authorize from the verified token alone, without loading the user.
+
+    Only the per-user token version is checked, and that lookup is cached, so
+    a bumped version (see revoke_tokens) invalidates outstanding tokens.
+    """
+    payload = _decode_token(credentials)
+
+    if payload.get("cv") != TOKEN_CLAIMS_VERSION:
+        # Token issued before claims were embedded; fall back to the full lookup
+        user = await get_current_user(credentials)
+        return TokenClaims(
+            id=user.id,
+            email=user.email,
+            role=user.role,
+            organization_id=user.organization_id,
+            token_version=user.token_version
+        )
+
+    claims = TokenClaims(
+        id=payload["uid"],
+        email=payload["sub"],
+        role=payload["role"],
+        organization_id=payload.get("org"),
+        token_version=payload.get("ver", 0)
+    )
+
+    if claims.role != "superadmin":
+        await _require_token_version(claims.id, claims.token_version)
+    return claims
+
+async def revoke_tokens(user_ids):
+    """Bump the token version so every token issued to these users is rejected"""
+    obj_ids = [ObjectId(user_id) for user_id in user_ids]
+    await database.db.users.update_many(
+        {"_id": {"$in": obj_ids}},
+        {"$inc": {"token_version": 1}}
+    )
+    for user_id in user_ids:
+        token_version_cache.pop(user_id)
+
+def invalidate_principal(email: str, user_id: Optional[str] = None):
+    principal_cache.pop(email)
+    if user_id is not None:
+        token_version_cache.pop(user_id)
+
+def invalidate_principals_by_id(user_ids):
+    ids = set(user_ids)
+    principal_cache.discard_where(lambda _, principal: principal.id in ids)
+    for user_id in ids:
+        token_version_cache.pop(user_id)
+
 def generate_random_password(length: int = 12) -> str:
     """Generate a random password with letters, digits and special chars"""
     chars = string.ascii_letters + string.digits + "!@#$%^&*"
@@ -153,28 +305,17 @@ async def send_credentials_email(
     </html>
     """
     
-    message = MIMEMultipart()
-    message["From"] = settings.SMTP_FROM_EMAIL
-    message["To"] = email
-    message["Subject"] = subject
-    
-    # Attach the HTML body
-    message.attach(MIMEText(body, "html"))
-    
-    # Create SMTP session
-    context = ssl.create_default_context()
-    with smtplib.SMTP_SSL(settings.SMTP_HOST, settings.SMTP_PORT, context=context) as server:
-        server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
-        server.send_message(message)
+    # Delivered by the outbox worker; see utils/email_outbox.py
+    await enqueue_email(email, subject, body, kind="credentials")
 
-async def send_role_change_email(
+def _role_change_message(
     email: str,
     first_name: str,
     last_name: str,
     old_role: str,
     new_role: str,
     organization_name: str
-):
+) -> dict:
     subject = "Your Role Has Been Updated"
     
     # Format roles for display
@@ -196,20 +337,27 @@ async def send_role_change_email(
         </body>
     </html>
     """
+    return {"to": email, "subject": subject, "html": body}
+
+async def send_role_change_email(
+    email: str,
+    first_name: str,
+    last_name: str,
+    old_role: str,
+    new_role: str,
+    organization_name: str
+):
+    message = _role_change_message(email, first_name, last_name, old_role, new_role, organization_name)
     
-    message = MIMEMultipart()
-    message["From"] = settings.SMTP_FROM_EMAIL
-    message["To"] = email
-    message["Subject"] = subject
-    
-    # Attach the HTML body
-    message.attach(MIMEText(body, "html"))
-    
-    # Create SMTP session
-    context = ssl.create_default_context()
-    with smtplib.SMTP_SSL(settings.SMTP_HOST, settings.SMTP_PORT, context=context) as server:
-        server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
-        server.send_message(message)
+    # Delivered by the outbox worker; see utils/email_outbox.py
+    await enqueue_email(message["to"], message["subject"], message["html"], kind="role_change")
+
+async def send_role_change_emails(changes: List[dict], organization_name: str):
+    """Queue one notification per ``{email, first_name, last_name, old_role, new_role}`` in a single batch"""
+    await enqueue_emails(
+        [_role_change_message(organization_name=organization_name, **change) for change in changes],
+        kind="role_change"
+    )
 
 async def send_forgot_password_email(
     email: str,
@@ -246,16 +394,5 @@ async def send_forgot_password_email(
     </html>
     """
     
-    message = MIMEMultipart()
-    message["From"] = settings.SMTP_FROM_EMAIL
-    message["To"] = email
-    message["Subject"] = subject
-    
-    # Attach the HTML body
-    message.attach(MIMEText(body, "html"))
-    
-    # Create SMTP session
-    context = ssl.create_default_context()
-    with smtplib.SMTP_SSL(settings.SMTP_HOST, settings.SMTP_PORT, context=context) as server:
-        server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
-        server.send_message(message)
\ No newline at end of file
+    # Delivered by the outbox worker; see utils/email_outbox.py
+    await enqueue_email(email, subject, body, kind="forgot_password")
\ No newline at end of file